@@ -1,31 +1,154 @@
+import copy
+import os
 import time
+from collections import deque
+
+from player_state import ChoiceHistory, PlayerState, SeenLines, bit_ids
+from renderers import AnimatedRenderer, HeadlessRenderer
+from story_loader import Choices, load_story, settle, walk
+
 
 class InteractiveStory:
-    def __init__(self):
-        """Initialize the story with player state and story segments."""
-        # Player state tracking
-        self.player_name = ""  # Stores the player's chosen name
-        self.inventory = []  # List of items the player has collected
-        self.health = 100  # Health points (not currently used but could be expanded)
-        self.location = "forest_entrance"  # Current location in the story
+    def __init__(self, story=None, renderer=None, seed=None):
+        """
+        Initialize the story with player state and story segments.
+
+        Args:
+            story (Story, optional): Compiled story table; defaults to the bundled forest story
+            renderer (Renderer, optional): Output and input backend; defaults to a typing-effect terminal
+            seed (int, optional): 64-bit seed the player's fights are rolled from; defaults to a random one.
+                Pass one to make a replayed playthrough fight every battle the same way
+        """
+        # Story content - compiled once and shared, never modified by a session
+        self.story = story if story is not None else load_story()
+        self.renderer = renderer if renderer is not None else AnimatedRenderer()
+
+        # Player state tracking - name, health, location, items, visited scenes and the seed fights are rolled from
+        if seed is None:
+            seed = int.from_bytes(os.urandom(8), "little")
+        self.state = PlayerState(self.story.start, health=self.story.combat.player.health, seed=seed)
         self.game_active = True  # Flag to track if the game is still running
 
         # Story progress tracking
-        self.visited_locations = set()  # Keeps track of all locations the player has visited
-        self.story_choices = []  # Records all choices made during the playthrough
+        self.story_choices = ChoiceHistory()  # Records all choices made during the playthrough
+        self.decision = None  # Prompt Node waiting for an answer when driven step by step (see advance/answer)
+        self.ending = None  # Name of the ending reached, if any
+        self.journal = None  # Optional story_save.SessionJournal that persists the session
+        self.observer = None  # Optional story_metrics.StoryObserver that receives timing and progress hooks
+        self.entered_at = 0.0  # When the current scene was entered (only tracked for the observer)
+        self.queued = deque()  # Answers typed ahead in a batch ("path; approach fountain"), waiting for their prompts
+        self.condense_revisits = True  # On returning to a scene, only show description lines not seen before
+        self.seen_text = SeenLines()  # Description lines of each scene already shown to this player
+
+    @property
+    def player_name(self):
+        """The player's chosen name."""
+        return self.state.name
+
+    @player_name.setter
+    def player_name(self, name):
+        self.state.name = name
+
+    @property
+    def health(self):
+        """Health points, lost in fights (see combat)."""
+        return self.state.health
+
+    @health.setter
+    def health(self, health):
+        self.state.health = health
+
+    @property
+    def location(self):
+        """Name of the current location in the story."""
+        return self.story.scene_keys[self.state.location]
+
+    @property
+    def inventory(self):
+        """Names of the items the player has collected."""
+        return [self.story.item_names[item] for item in bit_ids(self.state.items)]
+
+    @property
+    def visited_locations(self):
+        """Names of all locations the player has visited."""
+        return {self.story.scene_keys[scene] for scene in bit_ids(self.state.visited)}
 
     def display_text(self, text, delay=0.01):
         """
-        Display text with a typing effect for better user experience.
+        Display a line of story text, with a typing effect if the renderer supports it.
 
         Args:
             text (str): The text to display
             delay (float): Time delay between characters for typing effect
         """
-        for char in text:
-            print(char, end='', flush=True)  # Print character without newline and flush buffer
-            time.sleep(delay)  # Small delay creates typing effect
-        print()  # Add newline after text is complete
+        if self.queued:
+            delay = 0  # The player already knows what comes next - no typing effect until the batch is used up
+
+        if self.observer is None:
+            self.renderer.write_line(text, delay)  # The renderer decides how (and whether) to animate
+            return
+
+        started = time.perf_counter()
+        self.renderer.write_line(text, delay)
+        self.observer.text_rendered(self.state.location, time.perf_counter() - started)
+
+    def read_answer(self):
+        """
+        Read one raw answer from the player.
+
+        Answers queued from an earlier batch are used first, without waiting.
+
+        Returns:
+            str: The answer, normalized to lowercase without surrounding spaces
+        """
+        if self.queued:
+            answer = self.queued.popleft()
+            self.renderer.write_line("> " + answer)  # Echo it so the transcript shows what was chosen
+            return answer
+
+        try:
+            if self.observer is None:
+                return self.queue_answers(self.renderer.read_line("> "))
+
+            started = time.perf_counter()
+            answer = self.queue_answers(self.renderer.read_line("> "))
+            self.observer.input_waited(self.state.location, time.perf_counter() - started)
+            return answer
+        except EOFError:
+            return "stop"  # No more input (Ctrl-D or end of a script) ends the story
+
+    def queue_answers(self, line):
+        """
+        Split a line of input into answers for this prompt and the ones after it.
+
+        Several answers can be given at once, separated by semicolons (e.g.
+        "path; approach fountain; yes"). The first answers the current prompt
+        and the rest are queued; each is still validated against the options of
+        the prompt it ends up answering.
+
+        Args:
+            line (str): The raw line typed by the player
+
+        Returns:
+            str: The answer for the current prompt, normalized to lowercase without surrounding spaces
+        """
+        if ";" not in line:
+            return line.strip().lower()  # The usual single answer
+
+        answers = [answer.strip().lower() for answer in line.split(";")]
+        answers = [answer for answer in answers if answer] or [""]  # Ignore empty pieces such as a trailing ';'
+        self.queued.extend(answers[1:])
+        return answers[0]
+
+    def pause(self, seconds):
+        """
+        Pause the story for dramatic effect.
+
+        Args:
+            seconds (float): How long to pause
+        """
+        if not self.queued:  # Skipped while queued answers are still being played through
+            self.renderer.pause(seconds)
 
     def get_user_input(self, prompt, options=None):
         """
@@ -33,25 +156,26 @@ class InteractiveStory:
 
         Args:
             prompt (str): The question to ask the user
-            options (list, optional): Valid response options
+            options (list, optional): Valid response options; story prompts pass
+                precomputed Choices so nothing is rebuilt per turn
 
         Returns:
-            str: User's validated input
+            str: User's validated input (the full option it matched, if options are given)
         """
+        if options and not isinstance(options, Choices):
+            options = Choices(options)  # Plain list from a caller - work out its text once, not per retry
+
+        show_prompt = True
         while True:
-            self.display_text("\n" + prompt)
+            if show_prompt:
+                self.display_text("\n" + prompt)
 
-            # Display options if provided
-            if options:
-                # Format options as a grammatical list (e.g., 'a', 'b', or 'c')
-                option_text = ", ".join([f"'{o}'" for o in options[:-1]])
-                if len(options) > 1:
-                    option_text += f", or '{options[-1]}'"
-                else:
-                    option_text = f"'{options[0]}'"
-                self.display_text(f"(Choose {option_text})")
+                # Display options if provided
+                if options:
+                    self.display_text(options.text)
+            show_prompt = True
 
-            user_input = input("> ").strip().lower()  # Get input and normalize
+            user_input = self.read_answer()
 
             # Check if user wants to stop
             if user_input == "stop":
@@ -59,30 +183,62 @@ class InteractiveStory:
                 self.game_active = False  # Set flag to end game
                 return "stop"
 
-            # Validate input if options are provided
-            if options and user_input not in [opt.lower() for opt in options]:
+            # Validate input if options are provided: exact answers, numbers, prefixes and small typos all count
+            if not options:
+                return user_input
+            matches = options.resolve(user_input)
+            if len(matches) == 1:
+                return matches[0]
+
+            if self.observer is not None:
+                self.observer.invalid_input(self.state.location)
+            if matches:
+                # Only narrow it down - the prompt and options are already on screen
+                self.display_text(f"Did you mean {' or '.join(repr(match) for match in matches)}?")
+                show_prompt = False
+            else:
                 self.display_text("That's not a valid choice. Please try again.")
-                continue
+            if self.queued:
+                # The rest of the batch was meant for prompts after this one - don't feed it to the wrong ones
+                self.queued.clear()
+                self.display_text("(The rest of your queued choices were skipped.)")
+
+    def format_options(self, options):
+        """
+        Format options as a grammatical list (e.g., "(Choose 'a', 'b', or 'c')").
 
-            return user_input
+        Args:
+            options (list): Valid response options
+
+        Returns:
+            str: The text listing the options
+        """
+        if not isinstance(options, Choices):
+            options = Choices(options)
+        return options.text
 
     def introduction(self):
-        """Display the introduction and get the player's name."""
+        """
+        Display the introduction and get the player's name.
+
+        Returns:
+            int: Id of the first scene, or None if the player stopped
+        """
         # Display title with slower typing effect for emphasis
-        self.display_text("THE ENCHANTED FOREST ADVENTURE", 0.05)
-        self.display_text("================================", 0.02)
-        time.sleep(0.5)  # Pause for dramatic effect
+        self.display_text(self.story.title, 0.05)
+        self.display_text("=" * (len(self.story.title) + 2), 0.02)
+        self.pause(0.5)  # Pause for dramatic effect
 
         # Introduction text
         self.display_text("\nWelcome to an interactive adventure where YOUR choices shape the story!")
         self.display_text("At any time, type 'stop' to end the adventure.")
-        time.sleep(1)  # Short pause before name input
+        self.pause(1)  # Short pause before name input
 
         # Get player name with validation
         while not self.player_name and self.game_active:
             name = self.get_user_input("\nWhat is your name, brave adventurer?")
             if name == "stop":  # Check if user wants to quit
-                return
+                return None
 
             if name:  # If name is not empty
                 self.player_name = name
@@ -90,381 +246,262 @@ class InteractiveStory:
             else:  # Empty input
                 self.display_text("Please enter a valid name.")
 
-        time.sleep(1)  # Pause before starting the adventure
-        self.forest_entrance()  # Begin the story at the first location
-
-    def forest_entrance(self):
-        """The starting location of the adventure."""
-        # Update player state
-        self.location = "forest_entrance"
-        self.visited_locations.add(self.location)  # Mark location as visited
-
-        # Location description
-        self.display_text(f"\n{self.player_name}, you stand at the entrance of the Enchanted Forest.")
-        self.display_text("Ancient trees tower above you, their leaves shimmering with an odd blue glow.")
-        self.display_text("A worn path leads deeper into the forest, while a small cave sits to your right.")
+        self.pause(1)  # Pause before starting the adventure
+        return self.story.start  # Begin the story at the first location
 
-        # Player decision point
-        choice = self.get_user_input("\nWhich way do you go?", ["path", "cave"])
-
-        # Check if game ended during input
-        if not self.game_active:
-            return
-
-        # Process player choice and transition to next scene
-        if choice == "path":
-            self.story_choices.append(("forest_entrance", "path"))  # Record choice
-            self.display_text("\nYou decide to follow the path deeper into the forest...")
-            time.sleep(1)  # Pause for transition
-            self.forest_clearing()  # Go to next location
-        else:
-            self.story_choices.append(("forest_entrance", "cave"))  # Record choice
-            self.display_text("\nYou cautiously approach the mysterious cave...")
-            time.sleep(1)  # Pause for transition
-            self.mysterious_cave()  # Go to next location
-
-    def forest_clearing(self):
-        """A clearing in the forest with a magical fountain."""
-        # Update player state
-        self.location = "forest_clearing"
-        self.visited_locations.add(self.location)  # Mark as visited
+    def play_scene(self, scene_id):
+        """
+        Run one scene from the compiled story table.
 
-        # Location description
-        self.display_text("\nThe path opens into a sunlit clearing.")
-        self.display_text("In the center stands a stone fountain, water sparkling with multicolored light.")
-        self.display_text("A small creature—perhaps a fairy—watches you from behind a tree.")
+        Args:
+            scene_id (int): Id of the scene to play
 
-        # Player decision point
-        choice = self.get_user_input("\nWhat do you do?", ["approach fountain", "talk to fairy"])
+        Returns:
+            int: Id of the next scene, or None if the story is over
+        """
+        node = self.enter_scene(scene_id)
 
-        # Check if game ended during input
-        if not self.game_active:
-            return
+        # Keep asking while the story offers a decision point
+        while node.prompt is not None:
+            choice = self.get_user_input(node.prompt, node.options)
 
-        # Process player choice
-        if choice == "approach fountain":
-            self.story_choices.append(("forest_clearing", "approach fountain"))  # Record choice
-            self.display_text("\nYou walk toward the beautiful fountain...")
-            time.sleep(1)  # Pause for transition
-            self.magic_fountain()  # Go to next location
-        else:
-            self.story_choices.append(("forest_clearing", "talk to fairy"))  # Record choice
-            self.display_text("\nYou slowly walk toward the fairy, trying not to scare it...")
-            time.sleep(1)  # Pause for transition
-            self.fairy_encounter()  # Go to next location
-
-    def mysterious_cave(self):
-        """A dark cave with ancient inscriptions."""
-        # Update player state
-        self.location = "mysterious_cave"
-        self.visited_locations.add(self.location)  # Mark as visited
+            # Check if game ended during input
+            if not self.game_active:
+                break
 
-        # Location description
-        self.display_text("\nThe cave is darker than expected but surprisingly warm.")
-        self.display_text("Your eyes adjust to reveal walls covered in strange glowing symbols.")
-        self.display_text("A soft humming noise comes from deeper within.")
-        self.display_text("There's also a small opening to your left that leads outside.")
+            steps, node = self.choose(node, choice)
+            self.show_steps(steps)
 
-        # Player decision point with three options
-        choice = self.get_user_input("\nWhat will you do?", ["follow sound", "examine symbols", "exit cave"])
+        return self.leave_scene(node)
 
-        # Check if game ended during input
-        if not self.game_active:
-            return
+    def enter_scene(self, scene_id):
+        """
+        Move into a scene and show its description.
 
-        # Process player choice
-        if choice == "follow sound":
-            self.story_choices.append(("mysterious_cave", "follow sound"))  # Record choice
-            self.display_text("\nYou decide to follow the mysterious humming sound...")
-            time.sleep(1)  # Pause for transition
-            self.crystal_chamber()  # Go to next location
-        elif choice == "examine symbols":
-            self.story_choices.append(("mysterious_cave", "examine symbols"))  # Record choice
-            self.display_text("\nYou move closer to study the unusual symbols...")
-            time.sleep(1)  # Pause for transition
-            self.ancient_language()  # Go to next location
-        else:
-            self.story_choices.append(("mysterious_cave", "exit cave"))  # Record choice
-            self.display_text("\nYou decide to leave the cave...")
-            time.sleep(1)  # Pause for transition
-            self.forest_clearing()  # Go to next location
-
-    def magic_fountain(self):
-        """Interaction with a magical fountain."""
-        # Update player state
-        self.location = "magic_fountain"
-        self.visited_locations.add(self.location)  # Mark as visited
+        Args:
+            scene_id (int): Id of the scene to enter
 
-        # Location description
-        self.display_text("\nThe fountain's water shifts colors as you approach.")
-        self.display_text("An inscription on the basin reads: 'Drink and be changed.'")
+        Returns:
+            Node: The node the scene continues from (a prompt, a next scene or an ending)
+        """
+        steps, node = self.arrive(scene_id)
+        self.show_steps(steps)  # Location description
+        return node
 
-        # Player decision point - simple yes/no choice
-        choice = self.get_user_input("\nDo you drink from the fountain?", ["yes", "no"])
+    def arrive(self, scene_id):
+        """
+        Move into a scene and work out its description, without showing anything.
 
-        # Check if game ended during input
-        if not self.game_active:
-            return
+        Args:
+            scene_id (int): Id of the scene to enter
 
-        # Process player choice
-        if choice == "yes":
-            self.story_choices.append(("magic_fountain", "drink"))  # Record choice
-            self.display_text("\nYou cup your hands and drink the cool, sweet water.")
-            self.display_text("A tingling sensation spreads throughout your body.")
-            self.display_text("You suddenly understand the language of the forest!")
-            self.inventory.append("forest tongue")  # Add item to inventory
-
-            time.sleep(2)  # Longer pause for significant moment
-            self.fairy_encounter()  # Go to next location
-        else:
-            self.story_choices.append(("magic_fountain", "refuse"))  # Record choice
-            self.display_text("\nYou decide not to risk drinking the strange water.")
-            self.display_text("As you step back, you notice a path leading to a tall tree.")
-
-            time.sleep(2)  # Pause for transition
-            self.ancient_tree()  # Go to next location
-
-    def fairy_encounter(self):
-        """Meeting with a forest fairy."""
+        Returns:
+            tuple: (steps to show, node the scene continues from)
+        """
         # Update player state
-        self.location = "fairy_encounter"
-        self.visited_locations.add(self.location)  # Mark as visited
-
-        # Basic description
-        self.display_text("\nThe tiny fairy flutters before you, glowing with soft blue light.")
-
-        # Conditional story branch based on inventory
-        if "forest tongue" in self.inventory:
-            # Player can understand the fairy
-            self.display_text("'Greetings, human!' the fairy chimes. 'Few come to our woods these days.'")
-            self.display_text("'I can guide you to the heart of the forest or to the old guardian's tree.'")
+        self.state.enter(scene_id)  # Move there and mark as visited
+        if self.journal is not None:
+            self.journal.scene_started(self.state)
+        if self.observer is not None:
+            self.observer.scene_entered(scene_id)
+            self.entered_at = time.perf_counter()
+
+        steps, node = self.follow(self.story.scene(scene_id))  # Pick the branch that applies
+        if self.condense_revisits and node.prompt is not None:
+            # A scene that moves on without asking anything is told in full: its text is all the player gets there
+            steps = self.unseen_steps(scene_id, steps)
+        return steps, node
+
+    def unseen_steps(self, scene_id, steps):
+        """
+        Condense a scene description to what the player has not seen yet.
 
-            # Player decision point with fairy-specific options
-            choice = self.get_user_input("\nWhere would you like the fairy to guide you?",
-                                         ["heart of forest", "guardian's tree"])
+        The first time this session shows the scene, every line is shown and
+        remembered (so a resumed session tells scenes in full again, even ones
+        the player visited before saving). After that the scene's revisit line
+        ("You return to ...") replaces the lines already seen, so only text that
+        changed (e.g. a branch that opened up because of a new item) is shown in
+        full. Pauses are kept only after lines that are shown. Only called for
+        descriptions that end in a prompt.
 
-            # Check if game ended during input
-            if not self.game_active:
-                return
+        Args:
+            scene_id (int): Id of the scene being entered
+            steps (list): The full description steps
 
-            # Process player choice
-            if choice == "heart of forest":
-                self.story_choices.append(("fairy_encounter", "heart of forest"))  # Record choice
-                self.display_text("\nThe fairy nods and leads you deeper into the forest...")
-                time.sleep(1)  # Pause for transition
-                self.forest_heart()  # Go to next location
+        Returns:
+            list: The steps to show
+        """
+        if scene_id not in self.seen_text:
+            self.seen_text.add(scene_id, [step for step in steps if type(step) is not float])
+            return steps
+
+        revisit = self.story.scene(scene_id).revisit
+        if revisit is None:
+            revisit = f"\nYou return to the {self.story.scene_keys[scene_id].replace('_', ' ')}."
+        seen = self.seen_text.get(scene_id)
+        condensed = [revisit]
+        shown = []
+        showing = False  # Whether the last line was shown, so the pause after it is kept
+        for step in steps:
+            if type(step) is float:
+                if showing:
+                    condensed.append(step)
             else:
-                self.story_choices.append(("fairy_encounter", "guardian's tree"))  # Record choice
-                self.display_text("\nThe fairy grins and zips ahead toward an enormous ancient tree...")
-                time.sleep(1)  # Pause for transition
-                self.ancient_tree()  # Go to next location
-        else:
-            # Player cannot understand the fairy - communication barrier
-            self.display_text("The fairy makes melodic sounds you cannot understand.")
-            self.display_text("It seems to be trying to communicate something important.")
-            self.display_text("After a moment, it looks disappointed and flies away.")
-
-            self.display_text("\nPerhaps there's a way to understand the fairy language...")
-            time.sleep(2)  # Pause for transition
-            self.forest_clearing()  # Return to previous location
-
-    def crystal_chamber(self):
-        """A chamber with magical crystals."""
-        # Update player state
-        self.location = "crystal_chamber"
-        self.visited_locations.add(self.location)  # Mark as visited
-
-        # Location description
-        self.display_text("\nThe tunnel opens into a chamber lined with glowing crystals.")
-        self.display_text("The humming grows louder here—it seems to come from the crystals themselves.")
-        self.display_text("In the center of the room is a pedestal with a crystal wand.")
-
-        # Player decision point with three options
-        choice = self.get_user_input("\nWhat do you do?", ["take wand", "touch crystals", "leave chamber"])
-
-        # Check if game ended during input
-        if not self.game_active:
-            return
+                showing = step not in seen
+                if showing:
+                    condensed.append(step)
+                    shown.append(step)
+        if shown:
+            self.seen_text.add(scene_id, shown)
+        return condensed
+
+    def leave_scene(self, node):
+        """
+        Finish the current scene once it has no more prompts.
 
-        # Process player choice
-        if choice == "take wand":
-            self.story_choices.append(("crystal_chamber", "take wand"))  # Record choice
-            self.display_text("\nAs your fingers close around the wand, energy courses through your arm!")
-            self.display_text("You've gained a powerful magical tool.")
-            self.inventory.append("crystal wand")  # Add item to inventory
-
-            time.sleep(2)  # Pause for significant moment
-            self.display_text("\nWith the wand in hand, you decide to leave the chamber...")
-            self.mysterious_cave()  # Return to previous location
-        elif choice == "touch crystals":
-            self.story_choices.append(("crystal_chamber", "touch crystals"))  # Record choice
-            self.display_text("\nAs your fingers brush against the crystals, visions flood your mind!")
-            self.display_text("You see glimpses of the forest's past, present, and possible futures.")
-            self.display_text("The experience leaves you dizzy but enlightened.")
-
-            time.sleep(2)  # Pause for transition
-            self.ancient_language()  # Go to next location
-        else:
-            self.story_choices.append(("crystal_chamber", "leave chamber"))  # Record choice
-            self.display_text("\nYou decide not to disturb anything and back out of the chamber...")
-            time.sleep(1)  # Pause for transition
-            self.mysterious_cave()  # Return to previous location
-
-    def ancient_language(self):
-        """Discovering the secrets of ancient runes."""
-        # Update player state
-        self.location = "ancient_language"
-        self.visited_locations.add(self.location)  # Mark as visited
+        Args:
+            node (Node): The node the scene ended on
 
-        # Basic description
-        self.display_text("\nYou study the glowing symbols carefully.")
+        Returns:
+            int: Id of the next scene, or None if the story is over
+        """
+        next_scene = None
+        if self.game_active:
+            if node.ending is not None:
+                self.conclusion(node.ending)  # Show the ending
+            else:
+                next_scene = node.next  # Go to next location
 
-        # Conditional branch based on inventory item
-        if "crystal wand" in self.inventory:
-            # Crystal wand allows translation of symbols
-            self.display_text("With the crystal wand in your hand, the symbols reorganize themselves!")
-            self.display_text("They now form words you can understand, telling an ancient story...")
-            self.display_text("The story speaks of a guardian spirit that protects the forest heart.")
+        if self.observer is not None:
+            self.observer.scene_exited(self.state.location, next_scene, time.perf_counter() - self.entered_at)
+        return next_scene
 
-            self.inventory.append("guardian knowledge")  # Add knowledge to inventory
-            time.sleep(2)  # Pause for significant moment
+    def advance(self, scene_id):
+        """
+        Play scenes without asking for input until the story reaches a decision point or ends.
 
-            # Player decision point with knowledge-specific options
-            choice = self.get_user_input("\nNow that you have this knowledge, where do you go?",
-                                         ["find guardian", "return to cave entrance"])
+        This drives a session step by step instead of through get_user_input: the
+        pending prompt is left in self.decision, to be answered with answer().
 
-            # Check if game ended during input
-            if not self.game_active:
+        Args:
+            scene_id (int): Scene to play from
+        """
+        while scene_id is not None and self.game_active:
+            node = self.enter_scene(scene_id)
+            if node.prompt is not None:
+                self.decision = node  # Wait here for answer()
                 return
+            scene_id = self.leave_scene(node)
 
-            # Process player choice
-            if choice == "find guardian":
-                self.story_choices.append(("ancient_language", "find guardian"))  # Record choice
-                self.display_text("\nArmed with new knowledge, you set out to find the forest guardian...")
-                time.sleep(1)  # Pause for transition
-                self.ancient_tree()  # Go to next location
-            else:
-                self.story_choices.append(("ancient_language", "return to cave"))  # Record choice
-                self.display_text("\nYou decide to head back to the cave entrance...")
-                time.sleep(1)  # Pause for transition
-                self.mysterious_cave()  # Return to previous location
-        else:
-            # Without crystal wand, symbols remain mysterious
-            self.display_text("The symbols seem to shift as you watch, but you cannot decipher them.")
-            self.display_text("Perhaps you need something to help translate them.")
-
-            time.sleep(2)  # Pause for transition
-            self.mysterious_cave()  # Return to previous location
-
-    def ancient_tree(self):
-        """Meeting the ancient tree guardian."""
-        # Update player state
-        self.location = "ancient_tree"
-        self.visited_locations.add(self.location)  # Mark as visited
+    def answer(self, choice):
+        """
+        Answer the pending decision point and play on to the next one (or the end).
 
-        # Location description
-        self.display_text("\nBefore you stands the largest tree you've ever seen.")
-        self.display_text("Its trunk must be thirty feet across, bark twisted into what almost looks like a face.")
+        Args:
+            choice (str): One of self.decision.options, or a shortcut for one (see Choices.resolve)
 
-        # Conditional branch based on inventory
-        if "guardian knowledge" in self.inventory:
-            # Player has knowledge about the guardian
-            self.display_text("\nRecognizing this as the guardian from the ancient text, you approach confidently.")
-            self.display_text("The bark shifts and cracks as the face becomes more defined!")
-            self.display_text("'Who comes to my domain with the knowledge of old?' a deep voice rumbles.")
+        Raises:
+            ValueError: If there is no pending decision or the choice does not pick exactly one of its options
+        """
+        node = self.decision
+        matches = node.options.resolve(choice.strip().lower()) if node is not None else ()
+        if len(matches) != 1:
+            raise ValueError(f"{choice!r} is not an option here")
+        choice = matches[0]
+
+        self.decision = None
+        steps, node = self.choose(node, choice)
+        self.show_steps(steps)
+        if node.prompt is not None:
+            self.decision = node  # Another prompt in the same scene
+            return
+        self.advance(self.leave_scene(node))
 
-            # Player decision point with dialogue options
-            response = self.get_user_input(f"\nHow do you respond to the guardian?",
-                                           ["seek knowledge", "need help"])
+    def fork(self, renderer=None, observer=None):
+        """
+        Clone this session, e.g. at a decision point to try every answer.
 
-            # Check if game ended during input
-            if not self.game_active:
-                return
+        The child shares the compiled story and the whole choice history with its
+        parent, and copies the few integers of player state, so forking costs the
+        same however long the session has been running. After the fork, parent
+        and child are fully independent. The child is neither journaled nor
+        observed as the parent's session: pass an observer (e.g. a SessionEvents
+        with its own session id) to follow it.
 
-            # Process player choice
-            if response == "seek knowledge":
-                self.story_choices.append(("ancient_tree", "seek knowledge"))  # Record choice
-                self.display_text("\n'I seek the wisdom of the forest,' you reply respectfully.")
-                self.display_text("The guardian's wooden face creaks into what might be a smile.")
-                self.display_text("'Then you shall have it. The heart of the forest welcomes you.'")
+        Args:
+            renderer (Renderer, optional): Renderer for the child; defaults to a headless one
+            observer (StoryObserver, optional): Observer for the child; defaults to none
 
-                time.sleep(2)  # Pause for transition
-                self.forest_heart()  # Go to final location
-            else:
-                self.story_choices.append(("ancient_tree", "need help"))  # Record choice
-                self.display_text("\n'The forest is in danger, and I need your help,' you explain.")
-                self.display_text("The guardian tree considers your words carefully.")
-                self.display_text("'The balance must be maintained. I shall assist you.'")
+        Returns:
+            InteractiveStory: The child session
+        """
+        child = copy.copy(self)  # Shallow: shared story and pending decision node
+        child.state = self.state.copy()
+        child.story_choices = self.story_choices.copy()
+        child.queued = deque(self.queued)
+        child.seen_text = self.seen_text.copy()
+        child.renderer = renderer if renderer is not None else HeadlessRenderer(keep_output=False)
+        child.journal = None  # A fork is not saved as the parent's session
+        child.observer = observer  # Nor logged under it
+        return child
+
+    def choose(self, node, choice):
+        """
+        Record the player's choice at a decision point and follow it.
 
-                self.inventory.append("guardian blessing")  # Add blessing to inventory
-                time.sleep(2)  # Pause for significant moment
-                self.forest_heart()  # Go to final location
-        else:
-            # Player lacks knowledge about the guardian
-            self.display_text("\nThe tree stands silent and imposing, showing no signs of life or magic.")
-            self.display_text("You feel there must be more to this tree, but you don't know how to proceed.")
+        Args:
+            node (Node): The node whose prompt was answered
+            choice (str): The validated answer
 
-            time.sleep(2)  # Pause for effect
-            self.display_text("\nPerhaps there are clues elsewhere in the forest...")
+        Returns:
+            tuple: (steps to show, node that ends with a prompt, a next scene or an ending)
+        """
+        if self.journal is not None or self.observer is not None:
+            index = node.options.index(choice)
+            if self.journal is not None:
+                self.journal.choice_made(index)
+            if self.observer is not None:
+                self.observer.choice_made(self.state.location, index)
+        node = node.edges[choice]  # One lookup instead of a chain of if/elif checks
+        self.story_choices.append((self.location, node.record))  # Record choice
+        return self.follow(node)
+
+    def follow(self, node):
+        """
+        Collect a node's text, grant its items and walk into the first branch that applies,
+        fighting any fight on the way.
 
-            # Player decision to continue exploring
-            choice = self.get_user_input("\nWhere do you go next?", ["back to clearing", "explore more"])
+        Nothing is displayed here, so every way of running a session (terminal,
+        headless or async) shares the same story logic.
 
-            # Check if game ended during input
-            if not self.game_active:
-                return
+        Args:
+            node (Node): The compiled story node to follow
+
+        Returns:
+            tuple: (steps to show, node that ends with a prompt, a next scene or an ending)
+        """
+        held = self.state.items
+        steps, self.state.items, node = walk(node, held)
+        if node.fight is not None:
+            node = settle(self.story, self.state, node, steps)
+        if self.observer is not None and self.state.items != held:
+            self.observer.items_granted(self.state.location, self.state.items & ~held)
+        return steps, node
+
+    def show_steps(self, steps):
+        """
+        Display a sequence of story steps.
 
-            # Process player choice
-            if choice == "back to clearing":
-                self.story_choices.append(("ancient_tree", "back to clearing"))  # Record choice
-                self.forest_clearing()  # Go to previous location
+        Args:
+            steps (tuple): Text lines (str or TextTemplate) and pauses in seconds (float)
+        """
+        for step in steps:
+            if type(step) is str:
+                self.display_text(step)  # Static text, shown as compiled
+            elif type(step) is float:
+                self.pause(step)  # Pause for transition
             else:
-                self.story_choices.append(("ancient_tree", "explore more"))  # Record choice
-                # Different outcomes based on inventory
-                if "crystal wand" not in self.inventory:
-                    self.display_text("\nYou decide to explore another part of the forest...")
-                    self.mysterious_cave()  # Go to unexplored location
-                else:
-                    # Crystal wand provides guidance
-                    self.display_text("\nWith your crystal wand, you sense a powerful presence deeper in the forest...")
-                    self.forest_heart()  # Skip to final location
-
-    def forest_heart(self):
-        """The magical center of the forest and story conclusion."""
-        # Update player state
-        self.location = "forest_heart"
-        self.visited_locations.add(self.location)  # Mark as visited
-
-        # Location description - final destination
-        self.display_text("\nYou enter a perfect circular clearing bathed in ethereal light.")
-        self.display_text("The very air seems to shimmer with magic, and the plants glow with inner light.")
-        self.display_text("In the center stands a brilliant crystalline structure pulsing with energy.")
-
-        # Different endings based on player inventory and choices
-        if "guardian blessing" in self.inventory:
-            # Best ending - Guardian of the Forest
-            self.display_text("\nThe blessing of the guardian protects you as you approach the heart.")
-            self.display_text("The crystal resonates with your presence, accepting you as a friend of the forest.")
-            self.display_text("Knowledge and understanding flow into your mind.")
-            self.display_text(f"\n{self.player_name}, you have become a Guardian of the Enchanted Forest!")
-
-            self.conclusion("guardian")  # Show guardian ending
-        elif "crystal wand" in self.inventory and "forest tongue" in self.inventory:
-            # Good ending - Forest Mage
-            self.display_text("\nYour crystal wand glows brightly as you approach the heart.")
-            self.display_text("With your understanding of the forest tongue, you hear whispers all around.")
-            self.display_text("The crystal responds to your wand, creating a bridge of light between them.")
-            self.display_text(f"\n{self.player_name}, you have become a Mage of the Enchanted Forest!")
-
-            self.conclusion("mage")  # Show mage ending
-        else:
-            # Basic ending - Explorer
-            self.display_text("\nThe heart of the forest is beautiful but mysterious to you.")
-            self.display_text("You sense there's much more to learn about this magical place.")
-            self.display_text("Perhaps with more knowledge or tools, you could unlock its secrets.")
-            self.display_text(f"\n{self.player_name}, your adventure in the Enchanted Forest has only just begun!")
-
-            self.conclusion("explorer")  # Show basic ending
+                self.display_text(step.render(self.player_name))  # Fill in player-specific fields
 
     def conclusion(self, ending_type):
         """
@@ -473,40 +510,72 @@ class InteractiveStory:
         Args:
             ending_type (str): Type of ending achieved ("guardian", "mage", or "explorer")
         """
-        # Display adventure summary and statistics
-        self.display_text("\n----- YOUR ADVENTURE SUMMARY -----")
-        self.display_text(f"Name: {self.player_name}")
-        self.display_text(f"Places visited: {len(self.visited_locations)}")
-        self.display_text(f"Items collected: {', '.join(self.inventory) if self.inventory else 'None'}")
-
-        # Display specific ending text based on ending type
-        if ending_type == "guardian":
-            # Best ending
-            self.display_text("\nEnding: Guardian of the Forest")
-            self.display_text("You've earned the highest honor the forest can bestow.")
-            self.display_text("Your connection to this magical place will last a lifetime.")
-        elif ending_type == "mage":
-            # Intermediate ending
-            self.display_text("\nEnding: Forest Mage")
-            self.display_text("You've unlocked powerful magical abilities and knowledge.")
-            self.display_text("The mysteries of nature are yours to explore.")
-        else:
-            # Basic ending
-            self.display_text("\nEnding: Forest Explorer")
-            self.display_text("You've only scratched the surface of what the forest holds.")
-            self.display_text("Return again with more knowledge to discover deeper secrets.")
+        for line in self.summary_lines(ending_type):
+            self.display_text(line)
+        self.ending = ending_type
+        self.game_active = False  # Set flag to end game
+        if self.journal is not None:
+            self.journal.session_ended()
+        if self.observer is not None:
+            self.observer.story_ended(self.state.location, ending_type)
+
+    def summary_lines(self, ending_type):
+        """
+        Build the adventure summary shown at the end of the story.
+
+        Args:
+            ending_type (str): Type of ending achieved ("guardian", "mage", or "explorer")
+
+        Returns:
+            list: Lines of text to display
+        """
+        # Adventure summary and statistics
+        items = self.inventory
+        lines = [
+            "\n----- YOUR ADVENTURE SUMMARY -----",
+            f"Name: {self.player_name}",
+            f"Places visited: {len(bit_ids(self.state.visited))}",
+            f"Items collected: {', '.join(items) if items else 'None'}",
+        ]
+        if self.state.fights:
+            lines.append(f"Fights: {self.state.fights}, finishing with {self.health} health")
+
+        # Specific ending text based on ending type
+        title, text = self.story.endings[ending_type]
+        lines.append(f"\nEnding: {title}")
+        lines.extend(text)
 
         # End game message
-        self.display_text("\nThank you for playing THE ENCHANTED FOREST ADVENTURE!")
-        self.game_active = False  # Set flag to end game
+        lines.append(f"\nThank you for playing {self.story.title}!")
+        return lines
+
+    def start_game(self, scene=None):
+        """
+        Begin the interactive story adventure.
+
+        Each scene returns the id of the next scene (or None when the story is
+        over), and this loop plays it. Scenes never call each other directly, so
+        the call stack stays the same depth no matter how many times the player
+        walks back and forth between locations.
+
+        Args:
+            scene (int, optional): Scene to continue from (e.g. a resumed save),
+                skipping the introduction
+        """
+        if scene is None:
+            scene = self.introduction()  # Start with introduction
 
-    def start_game(self):
-        """Begin the interactive story adventure."""
-        self.introduction()  # Start with introduction
+        # Scene dispatch loop - run scenes one after another until the story ends
+        while scene is not None and self.game_active:
+            scene = self.play_scene(scene)  # Run the scene and get the next one
 
         # If game ended early, show a goodbye message
-        if not self.game_active and not self.location == "forest_heart":
+        if not self.game_active and self.ending is None:
             self.display_text("\nYour adventure has ended. Perhaps you'll return to the Enchanted Forest another day!")
+            if self.journal is not None:
+                self.journal.session_ended()
+            if self.observer is not None:
+                self.observer.story_ended(self.state.location, None)
 
 
 # Main program execution
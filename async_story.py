@@ -0,0 +1,379 @@
+import argparse
+import asyncio
+import time
+
+from InteractiveStoryProject import InteractiveStory
+from story_events import EventLog, SessionEvents
+from story_loader import Choices, load_story
+
+
+class AsyncRenderer:
+    """Awaitable counterpart of renderers.Renderer, used by AsyncInteractiveStory."""
+
+    async def write_line(self, text, delay=0.0):
+        """Show one line of story text."""
+        raise NotImplementedError
+
+    async def pause(self, seconds):
+        """Pause without blocking other sessions on the event loop."""
+        raise NotImplementedError
+
+    async def read_line(self, prompt):
+        """
+        Read one line of player input.
+
+        Raises:
+            EOFError: If the player has disconnected
+        """
+        raise NotImplementedError
+
+
+class StreamRenderer(AsyncRenderer):
+    """Line protocol over an asyncio stream pair: one line of text out per story line, one line in per answer."""
+
+    def __init__(self, reader, writer, pace=1.0):
+        """
+        Initialize the renderer.
+
+        Args:
+            reader (asyncio.StreamReader): Where player answers come from
+            writer (asyncio.StreamWriter): Where story text goes
+            pace (float): Multiplier for pauses (0 skips them)
+        """
+        self.reader = reader
+        self.writer = writer
+        self.pace = pace
+
+    async def write_line(self, text, delay=0.0):
+        self.writer.write((text + "\n").encode())  # Buffered until the next drain
+
+    async def pause(self, seconds):
+        if self.pace > 0:
+            await self.writer.drain()  # Let the player see the text before the pause
+            await asyncio.sleep(seconds * self.pace)
+
+    async def read_line(self, prompt):
+        self.writer.write(prompt.encode())
+        await self.writer.drain()
+        try:
+            line = await self.reader.readuntil(b"\n")
+        except asyncio.IncompleteReadError as error:
+            line = error.partial  # Last line without a newline, or nothing once the connection is closed
+        except asyncio.LimitOverrunError:
+            # Longer than the stream's limit: drop it and let it count as an answer that matches nothing
+            await self.skip_line()
+            return ""
+        if not line:
+            raise EOFError  # Connection closed
+        return line.decode(errors="replace")
+
+    async def skip_line(self):
+        """Discard input up to and including the next newline, however long the line is."""
+        while True:
+            try:
+                await self.reader.readuntil(b"\n")
+                return
+            except asyncio.LimitOverrunError as error:
+                await self.reader.readexactly(error.consumed)  # Drop what is buffered and look again
+            except asyncio.IncompleteReadError:
+                return  # Connection closed mid-line; the next read reports it
+
+
+class QuietRenderer(AsyncRenderer):
+    """AsyncRenderer that shows nothing and has no player to ask, for forked sessions driven by answer()."""
+
+    async def write_line(self, text, delay=0.0):
+        pass
+
+    async def pause(self, seconds):
+        pass
+
+    async def read_line(self, prompt):
+        raise EOFError  # Nobody is typing; the session stops if it ever asks
+
+
+class AsyncInteractiveStory(InteractiveStory):
+    """
+    InteractiveStory for an asyncio event loop.
+
+    Input and pauses are awaited, so one process can host many sessions at once.
+    Each session has its own player state; only the compiled story is shared.
+    The story logic itself (follow, choose, summary_lines) is inherited unchanged;
+    everything that shows text or asks for input, including the step-by-step
+    advance() and answer(), is awaited.
+    """
+
+    async def display_text(self, text, delay=0.01):
+        if self.queued:
+            delay = 0
+
+        if self.observer is None:
+            await self.renderer.write_line(text, delay)
+            return
+
+        started = time.perf_counter()
+        await self.renderer.write_line(text, delay)
+        self.observer.text_rendered(self.state.location, time.perf_counter() - started)
+
+    async def read_answer(self):
+        if self.queued:
+            answer = self.queued.popleft()
+            await self.renderer.write_line("> " + answer)
+            return answer
+
+        try:
+            if self.observer is None:
+                return self.queue_answers(await self.renderer.read_line("> "))
+
+            started = time.perf_counter()
+            answer = self.queue_answers(await self.renderer.read_line("> "))
+            self.observer.input_waited(self.state.location, time.perf_counter() - started)
+            return answer
+        except EOFError:
+            return "stop"  # Player disconnected
+
+    async def pause(self, seconds):
+        if not self.queued:
+            await self.renderer.pause(seconds)
+
+    async def show_steps(self, steps):
+        for step in steps:
+            if type(step) is str:
+                await self.display_text(step)  # Static text, shown as compiled
+            elif type(step) is float:
+                await self.pause(step)  # Pause for transition
+            else:
+                await self.display_text(step.render(self.player_name))  # Fill in player-specific fields
+
+    async def get_user_input(self, prompt, options=None):
+        if options and not isinstance(options, Choices):
+            options = Choices(options)  # Plain list from a caller - work out its text once, not per retry
+
+        show_prompt = True
+        while True:
+            if show_prompt:
+                await self.display_text("\n" + prompt)
+
+                # Display options if provided
+                if options:
+                    await self.display_text(options.text)
+            show_prompt = True
+
+            user_input = await self.read_answer()
+
+            # Check if user wants to stop
+            if user_input == "stop":
+                await self.display_text("\nYou've chosen to stop the story. Goodbye!")
+                self.game_active = False  # Set flag to end game
+                return "stop"
+
+            # Validate input if options are provided
+            if not options:
+                return user_input
+            matches = options.resolve(user_input)
+            if len(matches) == 1:
+                return matches[0]
+
+            if self.observer is not None:
+                self.observer.invalid_input(self.state.location)
+            if matches:
+                await self.display_text(f"Did you mean {' or '.join(repr(match) for match in matches)}?")
+                show_prompt = False
+            else:
+                await self.display_text("That's not a valid choice. Please try again.")
+            if self.queued:
+                self.queued.clear()
+                await self.display_text("(The rest of your queued choices were skipped.)")
+
+    async def introduction(self):
+        # Display title with slower typing effect for emphasis
+        await self.display_text(self.story.title, 0.05)
+        await self.display_text("=" * (len(self.story.title) + 2), 0.02)
+        await self.pause(0.5)  # Pause for dramatic effect
+
+        # Introduction text
+        await self.display_text("\nWelcome to an interactive adventure where YOUR choices shape the story!")
+        await self.display_text("At any time, type 'stop' to end the adventure.")
+        await self.pause(1)  # Short pause before name input
+
+        # Get player name with validation
+        while not self.player_name and self.game_active:
+            name = await self.get_user_input("\nWhat is your name, brave adventurer?")
+            if name == "stop":  # Check if user wants to quit
+                return None
+
+            if name:  # If name is not empty
+                self.player_name = name
+                await self.display_text(f"\nWelcome, {self.player_name}! Your adventure awaits...")
+            else:  # Empty input
+                await self.display_text("Please enter a valid name.")
+
+        await self.pause(1)  # Pause before starting the adventure
+        return self.story.start  # Begin the story at the first location
+
+    async def play_scene(self, scene_id):
+        node = await self.enter_scene(scene_id)
+
+        # Keep asking while the story offers a decision point
+        while node.prompt is not None:
+            choice = await self.get_user_input(node.prompt, node.options)
+
+            # Check if game ended during input
+            if not self.game_active:
+                break
+
+            steps, node = self.choose(node, choice)
+            await self.show_steps(steps)
+
+        return await self.leave_scene(node)
+
+    async def enter_scene(self, scene_id):
+        steps, node = self.arrive(scene_id)
+        await self.show_steps(steps)  # Location description
+        return node
+
+    async def leave_scene(self, node):
+        next_scene = None
+        if self.game_active:
+            if node.ending is not None:
+                await self.conclusion(node.ending)  # Show the ending
+            else:
+                next_scene = node.next  # Go to next location
+
+        if self.observer is not None:
+            self.observer.scene_exited(self.state.location, next_scene, time.perf_counter() - self.entered_at)
+        return next_scene
+
+    async def advance(self, scene_id):
+        while scene_id is not None and self.game_active:
+            node = await self.enter_scene(scene_id)
+            if node.prompt is not None:
+                self.decision = node  # Wait here for answer()
+                return
+            scene_id = await self.leave_scene(node)
+
+    async def answer(self, choice):
+        node = self.decision
+        matches = node.options.resolve(choice.strip().lower()) if node is not None else ()
+        if len(matches) != 1:
+            raise ValueError(f"{choice!r} is not an option here")
+        choice = matches[0]
+
+        self.decision = None
+        steps, node = self.choose(node, choice)
+        await self.show_steps(steps)
+        if node.prompt is not None:
+            self.decision = node  # Another prompt in the same scene
+            return
+        await self.advance(await self.leave_scene(node))
+
+    def fork(self, renderer=None, observer=None):
+        """
+        Clone this session (see InteractiveStory.fork).
+
+        Args:
+            renderer (AsyncRenderer, optional): Renderer for the child; defaults to a QuietRenderer
+            observer (StoryObserver, optional): Observer for the child; defaults to none
+
+        Returns:
+            AsyncInteractiveStory: The child session
+        """
+        return super().fork(renderer if renderer is not None else QuietRenderer(), observer)
+
+    async def conclusion(self, ending_type):
+        for line in self.summary_lines(ending_type):
+            await self.display_text(line)
+        self.ending = ending_type
+        self.game_active = False  # Set flag to end game
+        if self.journal is not None:
+            self.journal.session_ended()
+        if self.observer is not None:
+            self.observer.story_ended(self.state.location, ending_type)
+
+    async def start_game(self, scene=None):
+        if scene is None:
+            scene = await self.introduction()  # Start with introduction
+
+        # Scene dispatch loop - run scenes one after another until the story ends
+        while scene is not None and self.game_active:
+            scene = await self.play_scene(scene)  # Run the scene and get the next one
+
+        # If game ended early, show a goodbye message
+        if not self.game_active and self.ending is None:
+            await self.display_text("\nYour adventure has ended. Perhaps you'll return to the Enchanted Forest another day!")
+            if self.journal is not None:
+                self.journal.session_ended()
+            if self.observer is not None:
+                self.observer.story_ended(self.state.location, None)
+
+
+async def serve(host="127.0.0.1", port=8023, story=None, pace=1.0, backlog=4096, events=None):
+    """
+    Serve the game over TCP, one story session per connection.
+
+    Args:
+        host (str): Address to listen on
+        port (int): Port to listen on (0 picks a free one)
+        story (Story, optional): Compiled story shared by all sessions
+        pace (float): Multiplier for pauses (0 skips them)
+        backlog (int): How many connections may wait to be accepted
+        events (EventLog, optional): Log every session's events here (the caller closes it)
+
+    Returns:
+        asyncio.Server: The running server
+    """
+    story = story if story is not None else load_story()
+
+    async def handle(reader, writer):
+        await play_connection(reader, writer, story, pace, events)
+
+    return await asyncio.start_server(handle, host, port, limit=4096, backlog=backlog)
+
+
+async def play_connection(reader, writer, story, pace=1.0, events=None):
+    """
+    Play one story session over a connection, then close it.
+
+    Args:
+        reader (asyncio.StreamReader): Where player answers come from
+        writer (asyncio.StreamWriter): Where story text goes
+        story (Story): Compiled story to play
+        pace (float): Multiplier for pauses (0 skips them)
+        events (EventLog, optional): Log the session's events here
+    """
+    session = AsyncInteractiveStory(story, StreamRenderer(reader, writer, pace))
+    if events is not None:
+        session.observer = SessionEvents(events, story)
+    try:
+        await session.start_game()
+        await writer.drain()
+    except ConnectionError:
+        pass  # Player went away mid-write
+    finally:
+        writer.close()
+
+
+async def main(host, port, pace, events=None):
+    """Run the TCP server until interrupted, logging session events to an EventLog if one is given."""
+    server = await serve(host, port, pace=pace, events=events)
+    print(f"Serving the story on {host}:{server.sockets[0].getsockname()[1]}")
+    async with server:
+        await server.serve_forever()
+
+
+# Main program execution
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the story to many players over a line-based TCP protocol.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8023)
+    parser.add_argument("--pace", type=float, default=1.0, help="multiplier for story pauses (0 disables them)")
+    parser.add_argument("--events", metavar="DIR", help="log every session's events to this directory (see story_events.py)")
+    args = parser.parse_args()
+    events = EventLog(args.events) if args.events else None
+    try:
+        asyncio.run(main(args.host, args.port, args.pace, events))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if events is not None:
+            events.close()  # Write the events still buffered
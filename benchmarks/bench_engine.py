@@ -0,0 +1,184 @@
+"""
+Benchmark suite for the story engine hot paths.
+
+Each case is timed with timeit (best of several repeats) and reported as
+nanoseconds per operation. Results can be written as JSON and compared with
+a stored baseline; cases slower than the baseline by more than the threshold
+are flagged and the script exits with status 1.
+
+    python benchmarks/bench_engine.py                        # print results
+    python benchmarks/bench_engine.py --save results.json    # write JSON
+    python benchmarks/bench_engine.py --compare              # compare with benchmarks/baseline.json
+    python benchmarks/bench_engine.py --save benchmarks/baseline.json   # refresh the baseline
+"""
+import argparse
+import io
+import itertools
+import json
+import os
+import platform
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from InteractiveStoryProject import InteractiveStory  # noqa: E402
+from renderers import HeadlessRenderer, TerminalRenderer  # noqa: E402
+from story_loader import load_story  # noqa: E402
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+LINE = "The humming grows louder here—it seems to come from the crystals themselves."
+
+# Shortest known route to each ending (the first answer is the player's name)
+ENDING_ROUTES = {
+    "explorer": ["ava", "path", "approach fountain", "yes", "heart of forest"],
+    "guardian": ["ava", "cave", "follow sound", "take wand", "examine symbols", "find guardian", "need help"],
+    "mage": ["ava", "cave", "follow sound", "take wand", "exit cave", "approach fountain", "yes", "heart of forest"],
+}
+
+
+def headless_session(story, inputs=()):
+    """Return a session that writes nowhere and answers from an endless input stream."""
+    session = InteractiveStory(story, HeadlessRenderer(inputs, keep_output=False))
+    session.player_name = "ava"
+    return session
+
+
+def cases(story):
+    """
+    Build the benchmark cases.
+
+    Returns:
+        dict: Case name -> (function to time, operations per call)
+    """
+    chars = len(LINE)
+
+    # display_text through a real terminal renderer (into memory, no animation)
+    terminal = InteractiveStory(story, TerminalRenderer(io.StringIO(), pace=0))
+
+    def display_line():
+        terminal.renderer.stream.seek(0)
+        terminal.display_text(LINE)
+
+    # get_user_input: prompt, option list and validation, answered straight away
+    options = story.scene(story.scene_ids["mysterious_cave"]).options
+    answering = headless_session(story, itertools.cycle(["exit cave"]))
+    retrying = headless_session(story, itertools.cycle(["nope", "exit cave"]))
+
+    # Scene transitions: walk cave -> chamber -> cave forever
+    looping = headless_session(story, itertools.cycle(["follow sound", "leave chamber"]))
+    cave = story.scene_ids["mysterious_cave"]
+    scene = [cave]
+
+    def transition():
+        scene[0] = looping.play_scene(scene[0])
+
+    # Inventory condition checks over every conditional branch in the story
+    branches = [branch for node in story.scenes for branch in node.branches]
+    item_sets = [0, 0b0001, 0b0011, 0b0111, 0b1111]
+
+    def condition_checks():
+        for items in item_sets:
+            for branch in branches:
+                branch.applies(items)
+
+    def playthrough(route):
+        def run():
+            InteractiveStory(story, HeadlessRenderer(route, keep_output=False)).start_game()
+        return run
+
+    result = {
+        "display_text_per_line": (display_line, 1),
+        "display_text_per_char": (display_line, chars),
+        "format_options": (lambda: answering.format_options(options), 1),
+        "get_user_input": (lambda: answering.get_user_input("\nWhat will you do?", options), 1),
+        "get_user_input_with_retry": (lambda: retrying.get_user_input("\nWhat will you do?", options), 1),
+        "scene_transition": (transition, 1),
+        "inventory_condition_check": (condition_checks, len(item_sets) * len(branches)),
+    }
+    for ending, route in ENDING_ROUTES.items():
+        result[f"playthrough_{ending}"] = (playthrough(route), 1)
+    return result
+
+
+def run_benchmarks(repeat=5, min_time=0.2):
+    """
+    Time every case.
+
+    Args:
+        repeat (int): Timing repeats per case; the fastest is kept
+        min_time (float): Rough seconds per repeat
+
+    Returns:
+        dict: Case name -> nanoseconds per operation
+    """
+    story = load_story()
+    results = {}
+    for name, (func, ops) in cases(story).items():
+        timer = timeit.Timer(func)
+        number, _ = timer.autorange()  # Calls needed for ~0.2s
+        number = max(1, int(number * min_time / 0.2))
+        best = min(timer.repeat(repeat, number)) / number
+        results[name] = round(best / ops * 1e9, 2)
+    return results
+
+
+def compare(results, baseline, threshold):
+    """
+    Compare results with a baseline.
+
+    Args:
+        results (dict): Case name -> ns per operation
+        baseline (dict): Case name -> ns per operation
+        threshold (float): Allowed slowdown, e.g. 0.2 for 20%
+
+    Returns:
+        list: Names of cases that regressed
+    """
+    regressions = []
+    print(f"{'case':<28} {'baseline ns':>12} {'now ns':>12} {'change':>8}")
+    for name, now in results.items():
+        before = baseline.get(name)
+        if before is None:
+            print(f"{name:<28} {'-':>12} {now:>12.1f}      new")
+            continue
+        change = now / before - 1
+        flag = "  REGRESSION" if change > threshold else ""
+        print(f"{name:<28} {before:>12.1f} {now:>12.1f} {change:>+8.1%}{flag}")
+        if flag:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--save", metavar="PATH", help="write results as JSON")
+    parser.add_argument("--compare", metavar="PATH", nargs="?", const=BASELINE_PATH,
+                        help="compare with a baseline JSON file (default: benchmarks/baseline.json)")
+    parser.add_argument("--threshold", type=float, default=0.25, help="slowdown that counts as a regression (0.25 = 25%%)")
+    parser.add_argument("--repeat", type=int, default=5, help="timing repeats per case")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.repeat)
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump({"python": platform.python_version(), "machine": platform.machine(), "results": results},
+                      f, indent=2)
+            f.write("\n")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} case(s) slower than baseline by more than {args.threshold:.0%}")
+            sys.exit(1)
+    else:
+        for name, ns in results.items():
+            print(f"{name:<28} {ns:>12.1f} ns/op")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Load test for the multi-process story server.
+
+Starts story_server.PreforkServer with each requested number of workers,
+then runs simulated players from several client processes (each keeping many
+connections open at once) and reports completed sessions per second and
+answer latency. Throughput should grow with the number of workers until the
+machine runs out of cores.
+
+    python benchmarks/bench_server.py --workers 1 2 4 --sessions 4000
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import signal
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_sessions import ROUTES, percentile  # noqa: E402
+from story_server import PreforkServer  # noqa: E402
+
+
+def run_server(workers, ready):
+    """Server process: start the workers, report the port, then accept connections until terminated."""
+    server = PreforkServer("127.0.0.1", 0, workers, pace=0)
+    ready.send(server.start())
+    # Set after the fork so only this process has it: terminate() then runs the finally below
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        server.serve_forever()
+    finally:
+        server.close()
+
+
+async def play_sessions(port, sessions, concurrency):
+    """Play sessions against the server, at most concurrency at a time. Returns the answer latencies."""
+    latencies = []
+    limit = asyncio.Semaphore(concurrency)
+
+    async def play(i):
+        async with limit:
+            reader, writer = await asyncio.open_connection("127.0.0.1", port, limit=1 << 16)
+            await reader.readuntil(b"> ")
+            for answer in ROUTES[i % len(ROUTES)]:
+                sent = time.perf_counter()
+                writer.write(answer.encode() + b"\n")
+                try:
+                    await reader.readuntil(b"> ")
+                except asyncio.IncompleteReadError:
+                    pass  # Story ended after this answer
+                latencies.append(time.perf_counter() - sent)
+            writer.close()
+
+    await asyncio.gather(*(play(i) for i in range(sessions)))
+    return latencies
+
+
+def run_client(job):
+    port, sessions, concurrency = job
+    return asyncio.run(play_sessions(port, sessions, concurrency))
+
+
+def measure(workers, clients, sessions, concurrency):
+    """
+    Run one load test.
+
+    Args:
+        workers (int): Server worker processes
+        clients (int): Client processes
+        sessions (int): Sessions played in total
+        concurrency (int): Open connections per client process
+
+    Returns:
+        tuple: (sessions per second, p50 latency, p99 latency)
+    """
+    ready, report = multiprocessing.Pipe()
+    server = multiprocessing.Process(target=run_server, args=(workers, report))
+    server.start()
+    port = ready.recv()
+    try:
+        jobs = [(port, sessions // clients, concurrency)] * clients
+        with multiprocessing.Pool(clients) as pool:
+            started = time.perf_counter()
+            latencies = [latency for part in pool.map(run_client, jobs) for latency in part]
+            elapsed = time.perf_counter() - started
+    finally:
+        server.terminate()  # Its SIGTERM handler exits through server.close(), which stops the workers
+        server.join()
+    return sessions // clients * clients / elapsed, percentile(latencies, 0.5), percentile(latencies, 0.99)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4], help="server worker counts to test")
+    parser.add_argument("--clients", type=int, default=os.cpu_count() or 1, help="client processes")
+    parser.add_argument("--sessions", type=int, default=4000, help="sessions played per run")
+    parser.add_argument("--concurrency", type=int, default=100, help="open connections per client process")
+    args = parser.parse_args()
+
+    print(f"{os.cpu_count()} CPUs, {args.clients} client processes")
+    print(f"{'workers':>8} {'sessions/s':>11} {'speedup':>8} {'p50 ms':>8} {'p99 ms':>8}")
+    base = None
+    for workers in args.workers:
+        rate, p50, p99 = measure(workers, args.clients, args.sessions, args.concurrency)
+        base = base or rate
+        print(f"{workers:>8} {rate:>11.0f} {rate / base:>7.2f}x {p50 * 1000:>8.2f} {p99 * 1000:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Concurrent session benchmark for the asyncio story engine.
+
+Runs many simulated players at once on one event loop and reports completed
+sessions per second and the p50/p99 response latency (time from a player's
+answer to the next prompt). Players run in memory by default; --tcp sends
+them through a local TCP server instead.
+
+    python benchmarks/bench_sessions.py --players 1000 10000
+    python benchmarks/bench_sessions.py --players 1000 --tcp
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from async_story import AsyncInteractiveStory, AsyncRenderer, serve  # noqa: E402
+from story_loader import load_story  # noqa: E402
+
+# Known routes to each ending, one answer per prompt (the first answer is the name)
+ROUTES = [
+    ["ava", "cave", "follow sound", "take wand", "examine symbols", "find guardian", "need help"],
+    ["ben", "path", "approach fountain", "yes", "heart of forest"],
+    ["cai", "cave", "follow sound", "take wand", "exit cave", "approach fountain", "yes", "heart of forest"],
+    ["dee", "path", "approach fountain", "no", "back to clearing", "talk to fairy", "bad answer",
+     "approach fountain", "yes", "heart of forest"],
+]
+
+
+class SimulatedPlayer(AsyncRenderer):
+    """In-memory player that answers prompts from a route and times each response."""
+
+    def __init__(self, answers, latencies, think):
+        self.answers = iter(answers)
+        self.latencies = latencies
+        self.think = think
+        self.answered_at = None  # When the last answer was ready for the engine
+
+    async def write_line(self, text, delay=0.0):
+        pass
+
+    async def pause(self, seconds):
+        pass
+
+    async def read_line(self, prompt):
+        now = time.perf_counter()
+        if self.answered_at is not None:
+            self.latencies.append(now - self.answered_at)
+        # The answer is ready after the think time, but the session only sees it once the
+        # event loop gets back to it, so queueing behind other sessions counts as latency
+        self.answered_at = time.perf_counter() + self.think
+        await asyncio.sleep(self.think)  # Always yield so sessions interleave like real players
+        for answer in self.answers:
+            return answer
+        raise EOFError
+
+
+async def run_memory(players, think):
+    """Run all players in memory. Returns (latencies, wall time)."""
+    story = load_story()
+    latencies = []
+
+    async def play(i):
+        player = SimulatedPlayer(ROUTES[i % len(ROUTES)], latencies, think)
+        await AsyncInteractiveStory(story, player).start_game()
+        latencies.append(time.perf_counter() - player.answered_at)  # Last answer -> end of story
+
+    start = time.perf_counter()
+    await asyncio.gather(*(play(i) for i in range(players)))
+    return latencies, time.perf_counter() - start
+
+
+async def run_tcp(players, think):
+    """Run all players as TCP clients of a local server. Returns (latencies, wall time)."""
+    server = await serve("127.0.0.1", 0, pace=0)
+    port = server.sockets[0].getsockname()[1]
+    latencies = []
+
+    async def play(i):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port, limit=1 << 16)
+        await reader.readuntil(b"> ")
+        for answer in ROUTES[i % len(ROUTES)]:
+            await asyncio.sleep(think)
+            sent = time.perf_counter()
+            writer.write(answer.encode() + b"\n")
+            try:
+                await reader.readuntil(b"> ")
+            except asyncio.IncompleteReadError:
+                pass  # Story ended after this answer
+            latencies.append(time.perf_counter() - sent)
+        writer.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(play(i) for i in range(players)))
+    elapsed = time.perf_counter() - start
+    server.close()
+    await server.wait_closed()
+    return latencies, elapsed
+
+
+def percentile(values, fraction):
+    """Return the value below which the given fraction of values fall."""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--players", type=int, nargs="+", default=[1000, 10000], help="concurrent players per run")
+    parser.add_argument("--think", type=float, default=0.0, help="seconds each player waits before answering")
+    parser.add_argument("--tcp", action="store_true", help="connect players through a local TCP server")
+    args = parser.parse_args()
+
+    runner = run_tcp if args.tcp else run_memory
+    print(f"{'players':>8} {'seconds':>8} {'sessions/s':>11} {'turns':>8} {'p50 ms':>8} {'p99 ms':>8}")
+    for players in args.players:
+        latencies, elapsed = asyncio.run(runner(players, args.think))
+        print(f"{players:>8} {elapsed:>8.2f} {players / elapsed:>11.0f} {len(latencies):>8} "
+              f"{percentile(latencies, 0.5) * 1000:>8.2f} {percentile(latencies, 0.99) * 1000:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
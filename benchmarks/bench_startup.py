@@ -0,0 +1,68 @@
+"""
+Startup benchmark: time from launching a game process to its first prompt.
+
+Each command is started several times; the median time until "> " appears
+on its output is reported. The first line is the bare interpreter start, the
+floor for any Python process.
+
+    python benchmarks/bench_startup.py --runs 10
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CLI = os.path.join(ROOT, "enchanted_forest.py")
+
+COMMANDS = [
+    ("interpreter only", [sys.executable, "-c", "pass"]),
+    ("InteractiveStoryProject.py", [sys.executable, os.path.join(ROOT, "InteractiveStoryProject.py")]),
+    ("cli --speed 0 --no-cache", [sys.executable, CLI, "--speed", "0", "--no-cache"]),
+    ("cli --headless", [sys.executable, CLI, "--headless"]),
+    ("cli --headless --name ava", [sys.executable, CLI, "--headless", "--name", "ava"]),
+]
+
+
+def time_to_prompt(command):
+    """
+    Start a command and wait for its first prompt.
+
+    Args:
+        command (list): The command line
+
+    Returns:
+        float: Seconds until "> " was written (or until the process exited)
+    """
+    started = time.perf_counter()
+    process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    output = b""
+    while b"> " not in output:
+        chunk = process.stdout.read1(4096)
+        if not chunk:
+            break  # Exited without prompting
+        output += chunk
+    elapsed = time.perf_counter() - started
+    process.kill()
+    process.wait()
+    process.stdout.close()
+    process.stdin.close()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5, help="launches per command")
+    args = parser.parse_args()
+
+    subprocess.run([sys.executable, CLI, "--precompile"], check=True, stdout=subprocess.DEVNULL)  # Warm the cache
+    print(f"{'command':<30} {'median ms':>10} {'min ms':>10}")
+    for label, command in COMMANDS:
+        times = [time_to_prompt(command) for _ in range(args.runs)]
+        print(f"{label:<30} {statistics.median(times) * 1000:>10.1f} {min(times) * 1000:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
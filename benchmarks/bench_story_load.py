@@ -0,0 +1,103 @@
+"""
+Story loading benchmark: compiling a story file versus opening a story pack.
+
+Generates worlds of increasing size (every scene has a few long lines of text
+and choices leading to other scenes), writes each as JSON and as a pack, and
+reports the time to load it, to play the first scene and to visit a sample
+of scenes.
+
+    python benchmarks/bench_story_load.py --scenes 1000 10000 100000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from story_loader import compile_story, read_story_file  # noqa: E402
+from story_pack import PackedStory, write_pack  # noqa: E402
+
+WORDS = "the old path winds between silver birches where moss glows faintly under a violet sky".split()
+
+
+def make_world(scenes, seed=0):
+    """
+    Build a story description with the given number of scenes.
+
+    Args:
+        scenes (int): Number of scenes
+        seed (int): Seed for the generated text and links
+
+    Returns:
+        dict: The story description
+    """
+    rng = random.Random(seed)
+    data = {"title": "Generated Forest", "items": ["lantern"], "scenes": {},
+            "endings": {"lost": {"title": "Lost", "text": ["The forest keeps you."]}}}
+    for i in range(scenes):
+        text = [" ".join(rng.choice(WORDS) for _ in range(40)) for _ in range(5)]
+        if i == scenes - 1:
+            data["scenes"][f"scene_{i}"] = {"text": text, "ending": "lost"}
+            continue
+        choices = {f"go {direction}": {"next": f"scene_{rng.randrange(i + 1, scenes)}"}
+                   for direction in ("north", "east", "west")}
+        data["scenes"][f"scene_{i}"] = {"text": text, "grant": ["lantern"] if i % 7 == 0 else [],
+                                        "prompt": "\nWhich way?", "choices": choices}
+    return data
+
+
+def measure(load, visits):
+    """
+    Time loading a story and using it.
+
+    Args:
+        load (callable): Returns the loaded Story
+        visits (list): Scene ids to look up after loading
+
+    Returns:
+        tuple: (load ms, first scene ms, visits ms)
+    """
+    started = time.perf_counter()
+    story = load()
+    loaded = time.perf_counter()
+    story.scene(story.start)
+    first = time.perf_counter()
+    for scene_id in visits:
+        story.scene(scene_id)
+    done = time.perf_counter()
+    return (loaded - started) * 1e3, (first - loaded) * 1e3, (done - first) * 1e3
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scenes", type=int, nargs="+", default=[1000, 10000, 100000], help="world sizes to test")
+    parser.add_argument("--visits", type=int, default=1000, help="scenes looked up after loading")
+    args = parser.parse_args()
+
+    print(f"{'scenes':>8} {'format':>6} {'file MB':>8} {'load ms':>10} {'first ms':>9} {'visits ms':>10}")
+    with tempfile.TemporaryDirectory() as directory:
+        for scenes in args.scenes:
+            data = make_world(scenes)
+            json_path = os.path.join(directory, f"world_{scenes}.json")
+            pack_path = os.path.join(directory, f"world_{scenes}.pack")
+            with open(json_path, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            write_pack(data, pack_path)
+            del data
+
+            visits = random.Random(1).sample(range(scenes), min(args.visits, scenes))
+            for label, path, load in (
+                ("json", json_path, lambda: compile_story(read_story_file(json_path))),
+                ("pack", pack_path, lambda: PackedStory(pack_path)),
+            ):
+                load_ms, first_ms, visits_ms = measure(load, visits)
+                size = os.path.getsize(path) / 1e6
+                print(f"{scenes:>8} {label:>6} {size:>8.1f} {load_ms:>10.2f} {first_ms:>9.3f} {visits_ms:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,377 @@
+import argparse
+import time
+from collections import namedtuple
+
+# Stats of one side of a fight. A fight's player is built from the story's base
+# stats, the player's current health and the bonuses of the items they hold.
+# For a batch of fights (see resolve) each field may instead be a sequence with
+# one value per fight.
+#   health        - health points at the start of the fight
+#   attack_low    - smallest damage roll
+#   attack_high   - largest damage roll
+#   defense       - subtracted from every hit taken (a hit always does at least 1 damage)
+#   poison        - damage a poisoned opponent takes at the end of each of its rounds
+#   poison_chance - chance in 100 that a hit poisons the opponent
+Fighter = namedtuple("Fighter", "health attack_low attack_high defense poison poison_chance")
+
+# How a story's fights are set up:
+#   player   - Fighter with the player's base stats (its health is the player's full health)
+#   bonuses  - (item bitmask, Fighter of stat bonuses) pairs, added while the item is held
+#   max_rounds - a fight the player hasn't won after this many rounds is lost
+CombatRules = namedtuple("CombatRules", "player bonuses max_rounds")
+
+DEFAULT_PLAYER = Fighter(100, 2, 6, 0, 0, 0)
+DEFAULT_MAX_ROUNDS = 50
+
+# A poisoned fighter keeps taking poison damage for this many of its rounds
+POISON_ROUNDS = 3
+
+# Batches at least this large are resolved with NumPy when it is installed; smaller
+# ones (a single fight in live play) aren't worth the array set-up
+NUMPY_MIN_BATCH = 64
+
+_MASK = (1 << 64) - 1
+_GOLDEN = 0x9E3779B97F4A7C15  # Step between the counters of one fight's rolls
+
+
+def splitmix64(z):
+    """
+    Scramble a 64-bit integer (the SplitMix64 finalizer).
+
+    Every dice roll in a fight is splitmix64 of the fight's key plus a counter,
+    so any roll can be computed on its own, in any order, by either resolver.
+
+    Args:
+        z (int): Value to scramble (only the low 64 bits are used)
+
+    Returns:
+        int: A 64-bit pseudo-random value
+    """
+    z &= _MASK
+    z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & _MASK
+    z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & _MASK
+    return z ^ (z >> 31)
+
+
+def _counter(round_number, roll):
+    # Offset of one of the four rolls made in a round, added to the fight's key
+    return ((round_number * 4 + roll + 1) * _GOLDEN) & _MASK
+
+
+_numpy_module = None
+
+
+def _numpy():
+    # NumPy is optional and only imported when a batch is big enough to need it
+    global _numpy_module
+    if _numpy_module is None:
+        try:
+            import numpy
+        except ImportError:
+            numpy = False
+        _numpy_module = numpy
+    return _numpy_module or None
+
+
+def compile_combat(data, item_ids):
+    """
+    Compile the "combat" and "enemies" sections of a story description.
+
+    Args:
+        data (dict): The parsed story file
+        item_ids (dict): Item name -> item id
+
+    Returns:
+        tuple: (CombatRules, enemy names tuple, enemy Fighters tuple), enemies in file order
+
+    Raises:
+        ValueError: If a stat is out of range or a bonus names an unknown item
+    """
+    combat = data.get("combat", {})
+    player = fighter(combat["player"], "combat player") if "player" in combat else DEFAULT_PLAYER
+    bonuses = []
+    for name, raw in combat.get("items", {}).items():
+        if name not in item_ids:
+            raise ValueError(f"combat items: unknown item {name!r}")
+        bonuses.append((1 << item_ids[name], fighter(raw, f"combat item {name!r}", bonus=True)))
+    rules = CombatRules(player, tuple(bonuses), combat.get("max_rounds", DEFAULT_MAX_ROUNDS))
+
+    enemies = data.get("enemies", {})
+    return rules, tuple(enemies), tuple(fighter(raw, f"enemy {name!r}") for name, raw in enemies.items())
+
+
+def fighter(raw, where, bonus=False):
+    """
+    Build a Fighter from its description in a story file.
+
+    "attack" is either one number or a [low, high] pair; every other stat is a
+    number and may be left out.
+
+    Args:
+        raw (dict): The description
+        where (str): Where it came from, for error messages
+        bonus (bool): True for item bonuses, which may lower stats but have no health
+
+    Returns:
+        Fighter: The stats
+
+    Raises:
+        ValueError: If a stat is out of range
+    """
+    attack = raw.get("attack", 0)
+    low, high = attack if isinstance(attack, list) else (attack, attack)
+    stats = Fighter(raw.get("health", 0 if bonus else 1), low, high, raw.get("defense", 0),
+                    raw.get("poison", 0), raw.get("poison_chance", 0))
+    if not bonus and (stats.health < 1 or low < 0 or high < low or stats.defense < 0 or stats.poison < 0
+                      or not 0 <= stats.poison_chance <= 100):
+        raise ValueError(f"{where}: stats out of range in {stats}")
+    return stats
+
+
+def player_fighter(rules, health, items):
+    """
+    Work out the player's stats for a fight.
+
+    Args:
+        rules (CombatRules): The story's combat rules
+        health (int): The player's current health
+        items (int): Bitmask of items the player holds
+
+    Returns:
+        Fighter: The player's stats, with the bonus of every held item added
+    """
+    stats = list(rules.player)
+    for mask, bonus in rules.bonuses:
+        if items & mask:
+            stats = [stat + extra for stat, extra in zip(stats, bonus)]
+    stats[0] = health
+    return Fighter(*stats)
+
+
+def resolve(seeds, player, enemy, max_rounds=DEFAULT_MAX_ROUNDS, use_numpy=None):
+    """
+    Resolve a batch of fights.
+
+    Each round the player strikes first: a damage roll between attack_low and
+    attack_high, less the enemy's defense (at least 1), and a roll against
+    poison_chance to poison the enemy for POISON_ROUNDS rounds. A poisoned
+    fighter then takes its poison damage. The enemy falls at 0 health;
+    otherwise it strikes back the same way. A fight still going after
+    max_rounds is lost.
+
+    The rolls come from the fight's seed alone (see splitmix64), so a fight
+    has the same result whichever resolver runs it and whatever else is in
+    its batch - a balance run over millions of seeds plays out exactly as
+    live play does.
+
+    Args:
+        seeds (sequence): One 64-bit seed per fight
+        player (Fighter): Player stats - numbers shared by every fight, or sequences with one value per fight
+        enemy (Fighter): Enemy stats, the same way
+        max_rounds (int): Rounds before a fight counts as lost
+        use_numpy (bool, optional): Force the NumPy (True) or pure Python (False) resolver;
+            by default NumPy is used for batches of NUMPY_MIN_BATCH or more when installed
+
+    Returns:
+        tuple: (won, health left, rounds fought) - a list or NumPy array each, one value per fight
+
+    Raises:
+        ImportError: If use_numpy is True and NumPy isn't installed
+    """
+    numpy = _numpy() if use_numpy or (use_numpy is None and len(seeds) >= NUMPY_MIN_BATCH) else None
+    if use_numpy and numpy is None:
+        raise ImportError("the NumPy resolver needs numpy installed")
+    if numpy is not None:
+        return _resolve_arrays(numpy, seeds, player, enemy, max_rounds)
+    return _resolve_loops(seeds, player, enemy, max_rounds)
+
+
+def _resolve_loops(seeds, player, enemy, max_rounds):
+    # Pure Python resolver: one fight at a time, rolling only the dice that are used
+    count = len(seeds)
+    player = Fighter(*(stat if isinstance(stat, (list, tuple)) else [stat] * count for stat in player))
+    enemy = Fighter(*(stat if isinstance(stat, (list, tuple)) else [stat] * count for stat in enemy))
+    won, health, rounds = [False] * count, [0] * count, [max_rounds] * count
+
+    for i, seed in enumerate(seeds):
+        key = splitmix64(seed)
+        player_health, enemy_health = player.health[i], enemy.health[i]
+        player_poisoned = enemy_poisoned = 0
+        for number in range(max_rounds):
+            # The player strikes
+            roll = splitmix64(key + _counter(number, 0)) % (player.attack_high[i] - player.attack_low[i] + 1)
+            enemy_health -= max(1, player.attack_low[i] + roll - enemy.defense[i])
+            if splitmix64(key + _counter(number, 1)) % 100 < player.poison_chance[i]:
+                enemy_poisoned = POISON_ROUNDS
+            if enemy_poisoned:
+                enemy_health -= player.poison[i]
+                enemy_poisoned -= 1
+            if enemy_health <= 0:
+                won[i], rounds[i] = True, number + 1
+                break
+
+            # The enemy strikes back
+            roll = splitmix64(key + _counter(number, 2)) % (enemy.attack_high[i] - enemy.attack_low[i] + 1)
+            player_health -= max(1, enemy.attack_low[i] + roll - player.defense[i])
+            if splitmix64(key + _counter(number, 3)) % 100 < enemy.poison_chance[i]:
+                player_poisoned = POISON_ROUNDS
+            if player_poisoned:
+                player_health -= enemy.poison[i]
+                player_poisoned -= 1
+            if player_health <= 0:
+                rounds[i] = number + 1
+                break
+        health[i] = max(player_health, 0)
+    return won, health, rounds
+
+
+def _resolve_arrays(np, seeds, player, enemy, max_rounds):
+    # NumPy resolver: every fight in the batch advances one round per step, finished ones masked out
+    count = len(seeds)
+    player = Fighter(*(np.broadcast_to(np.asarray(stat, dtype=np.int64), (count,)) for stat in player))
+    enemy = Fighter(*(np.broadcast_to(np.asarray(stat, dtype=np.int64), (count,)) for stat in enemy))
+    player_span = (player.attack_high - player.attack_low + 1).astype(np.uint64)
+    enemy_span = (enemy.attack_high - enemy.attack_low + 1).astype(np.uint64)
+    hundred = np.uint64(100)
+
+    def mix(z):
+        # splitmix64 over a uint64 array (multiplication wraps like the & _MASK above)
+        z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        return z ^ (z >> np.uint64(31))
+
+    key = mix(np.asarray(seeds, dtype=np.uint64))
+    player_health, enemy_health = player.health.copy(), enemy.health.copy()
+    player_poisoned, enemy_poisoned = np.zeros(count, np.int64), np.zeros(count, np.int64)
+    active = np.ones(count, dtype=bool)
+    won = np.zeros(count, dtype=bool)
+    rounds = np.full(count, max_rounds, dtype=np.int64)
+
+    for number in range(max_rounds):
+        if not active.any():
+            break
+
+        # The player strikes
+        roll = (mix(key + np.uint64(_counter(number, 0))) % player_span).astype(np.int64)
+        enemy_health -= np.where(active, np.maximum(1, player.attack_low + roll - enemy.defense), 0)
+        hit = (mix(key + np.uint64(_counter(number, 1))) % hundred).astype(np.int64) < player.poison_chance
+        enemy_poisoned[active & hit] = POISON_ROUNDS
+        ticking = active & (enemy_poisoned > 0)
+        enemy_health -= np.where(ticking, player.poison, 0)
+        enemy_poisoned -= ticking.astype(np.int64)
+        beaten = active & (enemy_health <= 0)
+        won |= beaten
+        rounds[beaten] = number + 1
+        active &= ~beaten
+
+        # The enemy strikes back
+        roll = (mix(key + np.uint64(_counter(number, 2))) % enemy_span).astype(np.int64)
+        player_health -= np.where(active, np.maximum(1, enemy.attack_low + roll - player.defense), 0)
+        hit = (mix(key + np.uint64(_counter(number, 3))) % hundred).astype(np.int64) < enemy.poison_chance
+        player_poisoned[active & hit] = POISON_ROUNDS
+        ticking = active & (player_poisoned > 0)
+        player_health -= np.where(ticking, enemy.poison, 0)
+        player_poisoned -= ticking.astype(np.int64)
+        fallen = active & (player_health <= 0)
+        rounds[fallen] = number + 1
+        active &= ~fallen
+
+    return won, np.maximum(player_health, 0), rounds
+
+
+def fight(story, state, enemy_id):
+    """
+    Resolve one story fight for a player, updating their health.
+
+    The seed comes from the player's seed and how many fights they have had,
+    so replaying a saved session fights every battle the same way again. A
+    player who wins keeps the health they have left; one who loses escapes
+    and recovers their full health.
+
+    Args:
+        story (Story): The compiled story
+        state (PlayerState): The player (health and fight count are updated)
+        enemy_id (int): Enemy to fight
+
+    Returns:
+        tuple: (True if the player won, text lines describing the outcome)
+    """
+    rules = story.combat
+    name = story.enemy_names[enemy_id]
+    seed = (state.seed + state.fights * _GOLDEN) & _MASK
+    won, health, rounds = resolve([seed], player_fighter(rules, state.health, state.items),
+                                  story.enemies[enemy_id], rules.max_rounds, use_numpy=False)
+    won, health, rounds = won[0], health[0], rounds[0]
+    state.fights += 1
+
+    length = f"{rounds} round{'s' if rounds != 1 else ''}"
+    if won:
+        state.health = health
+        return True, [1.0, f"\nYou defeat the {name} after {length}, with {health} health left."]
+    state.health = rules.player.health
+    return False, [1.0, f"\nThe {name} overpowers you after {length}."]
+
+
+def balance(story, enemy_name, items=(), health=None, fights=100000, seed=0, use_numpy=None):
+    """
+    Fight one enemy many times with the same resolver live play uses.
+
+    Args:
+        story (Story): The compiled story
+        enemy_name (str): Enemy to fight
+        items (list): Names of the items the player holds
+        health (int, optional): Player health at the start; defaults to full health
+        fights (int): Number of fights
+        seed (int): Seed of the first fight; the others follow it
+        use_numpy (bool, optional): See resolve
+
+    Returns:
+        tuple: (won, health left, rounds fought) per fight, as resolve returns them
+    """
+    mask = 0
+    for name in items:
+        mask |= 1 << story.item_ids[name]
+    rules = story.combat
+    player = player_fighter(rules, rules.player.health if health is None else health, mask)
+    seeds = range(seed, seed + fights)
+    if use_numpy is not False and _numpy() is not None and fights >= NUMPY_MIN_BATCH:
+        seeds = _numpy().arange(seed, seed + fights, dtype=_numpy().uint64)
+    return resolve(seeds, player, story.enemies[story.enemy_ids[enemy_name]], rules.max_rounds, use_numpy)
+
+
+# Main program execution
+if __name__ == "__main__":
+    from story_loader import DEFAULT_STORY_PATH, load_story
+
+    parser = argparse.ArgumentParser(description="Fight a story enemy many times and report how the fights go.")
+    parser.add_argument("enemy", nargs="?", help="enemy to fight (default: every enemy in the story)")
+    parser.add_argument("--items", nargs="*", default=[], help="items the player holds")
+    parser.add_argument("--health", type=int, help="player health at the start (default: full)")
+    parser.add_argument("--fights", type=int, default=100000, help="fights per enemy")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the first fight")
+    parser.add_argument("--python", action="store_true", help="use the pure Python resolver even if NumPy is installed")
+    parser.add_argument("--check", action="store_true",
+                        help="also resolve the first 1000 fights one at a time, as live play does, and compare")
+    parser.add_argument("--story", default=DEFAULT_STORY_PATH, help="story file to use")
+    args = parser.parse_args()
+
+    story = load_story(args.story)
+    use_numpy = False if args.python else None
+    print(f"Resolver: {'NumPy' if not args.python and _numpy() and args.fights >= NUMPY_MIN_BATCH else 'pure Python'}")
+    for enemy in [args.enemy] if args.enemy else story.enemy_names:
+        started = time.perf_counter()
+        won, left, rounds = balance(story, enemy, args.items, args.health, args.fights, args.seed, use_numpy)
+        elapsed = time.perf_counter() - started
+        wins = int(sum(won))
+        left_after_wins = sum(int(h) for w, h in zip(won, left) if w)
+        print(f"{enemy}: won {wins / args.fights:.2%} of {args.fights} fights, "
+              f"{sum(int(r) for r in rounds) / args.fights:.2f} rounds on average, "
+              f"{left_after_wins / max(wins, 1):.1f} health left after a win "
+              f"({args.fights / elapsed:.0f} fights/s)")
+        if args.check:
+            sample = min(args.fights, 1000)
+            single = [balance(story, enemy, args.items, args.health, 1, args.seed + i, False) for i in range(sample)]
+            if any((bool(w[0]), int(h[0]), int(r[0])) != (bool(won[i]), int(left[i]), int(rounds[i]))
+                   for i, (w, h, r) in enumerate(single)):
+                raise SystemExit(f"{enemy}: batch and single-fight results differ")
+            print(f"  first {sample} fights match when resolved one at a time")
@@ -0,0 +1,98 @@
+import argparse
+import os
+import sys
+
+# Only argparse is imported up front, so --help and bad arguments never pay for loading the engine
+STORY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "forest_story.json")
+
+
+def make_parser():
+    """Build the command-line parser."""
+    parser = argparse.ArgumentParser(description="Play The Enchanted Forest Adventure.")
+    parser.add_argument("--story", default=STORY_PATH, help="story file (.json, .toml or .pack) to play")
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="multiplier for typing delays and pauses (2 = twice as slow, 0 = no waiting)")
+    parser.add_argument("--animation", choices=("typing", "lines"), default="typing",
+                        help="type text out character by character, or show whole lines at once")
+    parser.add_argument("--headless", action="store_true",
+                        help="plain output with no animation or pauses, for scripts and bots reading stdin")
+    parser.add_argument("--name", help="player name (skips the name prompt)")
+    parser.add_argument("--no-cache", action="store_true", help="compile the story in memory instead of using a cached pack")
+    parser.add_argument("--precompile", action="store_true", help="build the cached pack for --story and exit")
+    parser.add_argument("--events", metavar="DIR", help="log the game's events to this directory (see story_events.py)")
+    return parser
+
+
+def load(args):
+    """
+    Load the story the way the options ask for.
+
+    .json and .toml stories go through a pack cached in __pycache__ beside
+    them, so after the first run starting up only reads the pack's header and
+    scenes are compiled as they are reached.
+
+    Args:
+        args (argparse.Namespace): The options
+
+    Returns:
+        Story: The story to play
+    """
+    if args.story.endswith(".pack") or args.no_cache:
+        from story_loader import load_story
+        return load_story(args.story)
+    from story_pack import load_cached
+    return load_cached(args.story)
+
+
+def make_renderer(args):
+    """
+    Build the renderer the options ask for.
+
+    Args:
+        args (argparse.Namespace): The options
+
+    Returns:
+        Renderer: The renderer
+    """
+    from renderers import AnimatedRenderer, TerminalRenderer
+    if args.headless:
+        return TerminalRenderer(pace=0)
+    if args.animation == "lines":
+        return TerminalRenderer(pace=args.speed)
+    return AnimatedRenderer(pace=args.speed)
+
+
+def main(argv=None):
+    """Run the game from the command line."""
+    parser = make_parser()
+    args = parser.parse_args(argv)
+    try:
+        story = load(args)
+    except (OSError, ValueError) as error:
+        parser.error(f"cannot load story {args.story!r}: {error}")  # Exits with the usual usage message
+    if args.precompile:
+        print(f"Story ready: {story.title} ({len(story.scenes)} scenes)")
+        return
+
+    from InteractiveStoryProject import InteractiveStory
+    session = InteractiveStory(story, make_renderer(args))
+    if args.name:
+        session.player_name = args.name
+    events = None
+    if args.events:
+        from story_events import EventLog, SessionEvents
+        events = EventLog(args.events)
+        session.observer = SessionEvents(events, story)
+    try:
+        session.start_game()
+    except KeyboardInterrupt:
+        print()  # Leave the terminal on a fresh line
+    finally:
+        if events is not None:
+            events.close()
+        sys.stdout.flush()
+
+
+# Main program execution
+if __name__ == "__main__":
+    main()
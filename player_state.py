@@ -0,0 +1,174 @@
+def bit_ids(mask):
+    """
+    List the ids whose bits are set in a bitmask.
+
+    Args:
+        mask (int): Bitmask where bit n stands for id n
+
+    Returns:
+        list: The set ids, lowest first
+    """
+    ids = []
+    while mask:
+        low = mask & -mask  # Isolate the lowest set bit
+        ids.append(low.bit_length() - 1)
+        mask ^= low
+    return ids
+
+
+class PlayerState:
+    """
+    Compact per-player game state.
+
+    Items and visited scenes are stored as integer bitmasks (bit n = item or
+    scene id n), so membership tests are a single AND, granting the same item
+    twice changes nothing, and copying a state only copies a few integers.
+    """
+
+    __slots__ = ("name", "health", "location", "items", "visited", "seed", "fights")
+
+    def __init__(self, location=0, name="", health=100, items=0, visited=0, seed=0, fights=0):
+        """
+        Initialize a player state.
+
+        Args:
+            location (int): Id of the current scene
+            name (str): The player's chosen name
+            health (int): Health points
+            items (int): Bitmask of collected item ids
+            visited (int): Bitmask of visited scene ids
+            seed (int): 64-bit seed the player's fights are rolled from
+            fights (int): Fights fought so far (each fight's dice depend on it)
+        """
+        self.name = name
+        self.health = health
+        self.location = location
+        self.items = items
+        self.visited = visited
+        self.seed = seed
+        self.fights = fights
+
+    def enter(self, scene_id):
+        """Move to a scene and mark it as visited."""
+        self.location = scene_id
+        self.visited |= 1 << scene_id
+
+    def copy(self):
+        """Return an independent snapshot of this state."""
+        return PlayerState(self.location, self.name, self.health, self.items, self.visited, self.seed, self.fights)
+
+    def __eq__(self, other):
+        if not isinstance(other, PlayerState):
+            return NotImplemented
+        return (self.name, self.health, self.location, self.items, self.visited, self.seed, self.fights) == \
+               (other.name, other.health, other.location, other.items, other.visited, other.seed, other.fights)
+
+    def __repr__(self):
+        return (f"PlayerState(location={self.location}, name={self.name!r}, health={self.health}, "
+                f"items={self.items:#x}, visited={self.visited:#x}, seed={self.seed:#x}, fights={self.fights})")
+
+
+class ChoiceHistory:
+    """
+    Append-only record of (location, choice) pairs with structural sharing.
+
+    Entries are stored as a chain of (entry, previous) pairs, newest first, so
+    copy() shares the whole chain instead of duplicating it: copying a history of
+    any length is O(1), and appending to a copy never changes the original.
+    """
+
+    __slots__ = ("_last", "_length")
+
+    def __init__(self, choices=()):
+        """
+        Initialize the history.
+
+        Args:
+            choices (iterable): Entries to start with, oldest first
+        """
+        self._last = None  # Newest entry as (entry, previous pair), or None when empty
+        self._length = 0
+        for choice in choices:
+            self.append(choice)
+
+    def append(self, choice):
+        """Add an entry at the end."""
+        self._last = (choice, self._last)
+        self._length += 1
+
+    def copy(self):
+        """Return an independent history that shares all current entries."""
+        history = ChoiceHistory()
+        history._last = self._last
+        history._length = self._length
+        return history
+
+    def __len__(self):
+        return self._length
+
+    def __reversed__(self):
+        link = self._last
+        while link is not None:
+            choice, link = link
+            yield choice
+
+    def __iter__(self):
+        return iter(list(reversed(self))[::-1])
+
+    def __getitem__(self, index):
+        if index == -1 and self._last is not None:
+            return self._last[0]  # Most recent choice without walking the chain
+        return list(self)[index]
+
+    def __eq__(self, other):
+        if isinstance(other, (ChoiceHistory, list, tuple)):
+            return len(self) == len(other) and list(self) == list(other)
+        return NotImplemented
+
+    def __repr__(self):
+        return f"ChoiceHistory({list(self)!r})"
+
+
+class SeenLines:
+    """
+    Scene id -> description lines of that scene the player has already been shown.
+
+    Lines are remembered per scene, so a line two scenes share is still shown
+    in the second one. copy() is O(1): the copy shares the table with the
+    original, and whichever of them adds lines first takes its own copy of
+    the table (each scene's lines are an immutable frozenset, so those are
+    never copied).
+    """
+
+    __slots__ = ("_scenes", "_shared")
+
+    def __init__(self):
+        self._scenes = {}  # Scene id -> frozenset of lines
+        self._shared = False  # True while another SeenLines may hold the same table
+
+    def get(self, scene_id):
+        """Return the lines already seen in a scene."""
+        return self._scenes.get(scene_id, frozenset())
+
+    def add(self, scene_id, lines):
+        """Remember that lines of a scene have been shown."""
+        seen = self._scenes.get(scene_id, frozenset())
+        if seen.issuperset(lines):
+            return
+        if self._shared:
+            self._scenes = dict(self._scenes)  # Copy on the first write after copy()
+            self._shared = False
+        self._scenes[scene_id] = seen.union(lines)
+
+    def copy(self):
+        """Return an independent record that shares the current table until either side changes."""
+        other = SeenLines()
+        other._scenes = self._scenes
+        other._shared = self._shared = True
+        return other
+
+    def __contains__(self, scene_id):
+        return scene_id in self._scenes
+
+    def __len__(self):
+        return len(self._scenes)
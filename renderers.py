@@ -0,0 +1,163 @@
+import select
+import sys
+import time
+
+
+class Renderer:
+    """
+    How a game session shows text, paces the story and reads the player's answers.
+
+    The story engine only talks to its renderer, so swapping renderers changes
+    how the game looks and feels without touching any scene code.
+    """
+
+    def write_line(self, text, delay=0.0):
+        """
+        Show one line of story text.
+
+        Args:
+            text (str): The text to display
+            delay (float): Seconds per character for renderers that animate text
+        """
+        raise NotImplementedError
+
+    def pause(self, seconds):
+        """Pause for dramatic effect or between scenes."""
+        raise NotImplementedError
+
+    def read_line(self, prompt):
+        """
+        Read one line of player input.
+
+        Args:
+            prompt (str): Prompt shown right before the input
+
+        Returns:
+            str: The raw line typed by the player
+
+        Raises:
+            EOFError: If there is no more input
+        """
+        raise NotImplementedError
+
+    def input_ready(self):
+        """Return True if the player has already typed ahead, so text can be shown without animation."""
+        return False
+
+
+class TerminalRenderer(Renderer):
+    """Writes whole lines to a terminal with one buffered write each, without animation."""
+
+    def __init__(self, stream=None, pace=1.0):
+        """
+        Initialize the renderer.
+
+        Args:
+            stream (file, optional): Where to write; defaults to sys.stdout
+            pace (float): Multiplier for pauses (0 skips them)
+        """
+        self.stream = stream if stream is not None else sys.stdout
+        self.pace = pace
+
+    def write_line(self, text, delay=0.0):
+        self.stream.write(text + "\n")  # Buffered - flushed before pauses and input
+
+    def pause(self, seconds):
+        if self.pace > 0 and not self.input_ready():
+            self.stream.flush()  # Show everything written so far before waiting
+            time.sleep(seconds * self.pace)
+
+    def read_line(self, prompt):
+        self.stream.write(prompt)
+        self.stream.flush()
+        return input()
+
+    def input_ready(self):
+        # A terminal only reports stdin as readable once a whole line has been entered
+        try:
+            return bool(select.select([sys.stdin], [], [], 0)[0])
+        except (OSError, ValueError):
+            return False  # stdin can't be polled (e.g. a Windows console or a replaced sys.stdin)
+
+
+class AnimatedRenderer(TerminalRenderer):
+    """
+    Typing effect driven by a time budget.
+
+    A line of n characters is given n * delay seconds. Instead of one write and
+    one sleep per character, the renderer wakes up once per frame and writes every
+    character that is due by then, so the cost is a few writes per line.
+    """
+
+    def __init__(self, stream=None, pace=1.0, fps=60):
+        """
+        Initialize the renderer.
+
+        Args:
+            stream (file, optional): Where to write; defaults to sys.stdout
+            pace (float): Multiplier for typing delays and pauses (0 skips them)
+            fps (int): Frames written per second while a line is being typed
+        """
+        super().__init__(stream, pace)
+        self.frame = 1.0 / fps
+
+    def write_line(self, text, delay=0.0):
+        per_char = delay * self.pace
+        if per_char <= 0 or not text or self.input_ready():
+            self.stream.write(text + "\n")
+            self.stream.flush()
+            return
+
+        start = time.monotonic()
+        shown = 0
+        while shown < len(text):
+            # Write every character that is due by now (always at least one)
+            due = max(shown + 1, min(len(text), int((time.monotonic() - start) / per_char) + 1))
+            self.stream.write(text[shown:due])
+            self.stream.flush()
+            shown = due
+
+            if shown < len(text) and self.input_ready():
+                self.stream.write(text[shown:] + "\n")  # The player typed ahead - finish the line at once
+                self.stream.flush()
+                return
+
+            if shown < len(text):
+                # Sleep until the next frame or until the line's budget runs out, whichever is sooner
+                remaining = len(text) * per_char - (time.monotonic() - start)
+                time.sleep(max(0.0, min(self.frame, remaining)))
+
+        # Keep the original pacing: the line takes its full budget even if writing was quick
+        remaining = len(text) * per_char - (time.monotonic() - start)
+        if remaining > 0:
+            time.sleep(remaining)
+        self.stream.write("\n")
+        self.stream.flush()
+
+
+class HeadlessRenderer(Renderer):
+    """No delays and no terminal: output is collected in memory, input comes from a script."""
+
+    def __init__(self, inputs=(), keep_output=True):
+        """
+        Initialize the renderer.
+
+        Args:
+            inputs (iterable): Lines to answer prompts with, in order
+            keep_output (bool): Whether to keep written lines in self.lines
+        """
+        self.inputs = iter(inputs)
+        self.keep_output = keep_output
+        self.lines = []  # Everything written so far, if keep_output is set
+
+    def write_line(self, text, delay=0.0):
+        if self.keep_output:
+            self.lines.append(text)
+
+    def pause(self, seconds):
+        pass  # No pacing for tests and bots
+
+    def read_line(self, prompt):
+        for line in self.inputs:
+            return line
+        raise EOFError  # Script ran out, same as input() at the end of stdin
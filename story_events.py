@@ -0,0 +1,373 @@
+import argparse
+import csv
+import glob
+import os
+import struct
+import sys
+import time
+from array import array
+from collections import Counter
+
+from player_state import bit_ids
+from story_loader import DEFAULT_STORY_PATH, load_story
+from story_metrics import StoryObserver
+
+# Event kinds, stored as one byte
+SCENE_ENTER, CHOICE, ITEM_GAINED, ENDING = range(4)
+EVENT_KINDS = ("scene_enter", "choice", "item_gained", "ending")
+
+# Value of an ENDING event when the player stopped instead of reaching an ending
+STOPPED = 0xFFFFFFFF
+
+# Live segments hold fixed-size rows: session id, unix time, kind, scene id and a value
+# (option index for choices, item id for items, ending id for endings)
+_EVENT = struct.Struct("<QdBII")
+
+# Compacted segments hold the same fields one column after another, so each field can be
+# read (or handed to a columnar tool) without touching the others
+COLUMNS_MAGIC = b"EFEC"
+COLUMNS_VERSION = 1
+_COLUMNS_HEADER = struct.Struct("<4sHQ")  # Magic, version, row count
+_COLUMN_TYPES = ("Q", "d", "B", "I", "I")  # array typecodes in row field order
+
+
+def _little_endian(column):
+    # Column files are little-endian whatever machine wrote or reads them
+    if sys.byteorder == "big":
+        column.byteswap()
+    return column
+
+
+class EventLog:
+    """
+    Append-only log of story events from any number of sessions, kept in a directory.
+
+    Events are buffered and appended to the current live segment in batches. A
+    live segment is closed once it reaches segment_bytes, and compact() rewrites
+    closed segments in a columnar layout sorted by session, so every session's
+    events sit together. Only one EventLog should write to a directory at a time.
+    Call close() (or use the log as a context manager) so the last batch is
+    written before the process exits.
+    """
+
+    def __init__(self, directory, batch_size=4096, segment_bytes=64 << 20):
+        """
+        Initialize the log.
+
+        Args:
+            directory (str): Where segment files are kept (created if missing)
+            batch_size (int): Buffered events that trigger a write
+            segment_bytes (int): Size at which the live segment is closed and a new one started
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.batch_size = batch_size
+        self.segment_bytes = segment_bytes
+        self.pending = bytearray()  # Encoded events not yet written
+        self.pending_count = 0
+        self.segment = max((segment_number(path) for path in segment_paths(directory)), default=0) + 1
+
+    def _live_path(self, number):
+        return os.path.join(self.directory, f"events-{number:06d}.log")
+
+    def new_session(self):
+        """Return a fresh 64-bit session id."""
+        return int.from_bytes(os.urandom(8), "little")
+
+    def append(self, session_id, kind, scene_id, value=0):
+        """
+        Log one event.
+
+        Args:
+            session_id (int): Session the event belongs to
+            kind (int): SCENE_ENTER, CHOICE, ITEM_GAINED or ENDING
+            scene_id (int): Scene the player was in
+            value (int): Option index, item id or ending id (see the event kinds)
+        """
+        self.pending += _EVENT.pack(session_id, time.time(), kind, scene_id, value)
+        self.pending_count += 1
+        if self.pending_count >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """Write buffered events to the live segment, starting a new segment when it is full."""
+        if not self.pending:
+            return
+        path = self._live_path(self.segment)
+        with open(path, "ab") as f:
+            f.write(self.pending)
+            size = f.tell()
+        self.pending.clear()
+        self.pending_count = 0
+        if size >= self.segment_bytes:
+            self.segment += 1
+
+    def close(self):
+        """Write every buffered event. The log can still be used afterwards."""
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def compact(self):
+        """
+        Rewrite every closed live segment as a columnar segment sorted by session.
+
+        The live segment being written is closed first, so everything logged so
+        far is compacted. Segments are compacted one at a time, so memory use is
+        bounded by segment_bytes.
+
+        Returns:
+            int: Number of segments compacted
+        """
+        self.flush()
+        if os.path.exists(self._live_path(self.segment)):
+            self.segment += 1  # Close the live segment; new events go to a fresh one
+
+        compacted = 0
+        for path in segment_paths(self.directory):
+            if not path.endswith(".log") or segment_number(path) >= self.segment:
+                continue
+            with open(path, "rb") as f:
+                rows = sorted(_EVENT.iter_unpack(f.read()), key=lambda row: row[0])  # Stable: time order kept
+            columns = [array(code) for code in _COLUMN_TYPES]
+            for row in rows:
+                for column, field in zip(columns, row):
+                    column.append(field)
+
+            target = path[:-len(".log")] + ".col"
+            with open(target + ".tmp", "wb") as f:
+                f.write(_COLUMNS_HEADER.pack(COLUMNS_MAGIC, COLUMNS_VERSION, len(rows)))
+                for column in columns:
+                    f.write(_little_endian(column).tobytes())
+            os.replace(target + ".tmp", target)  # Atomic, then the live copy can go
+            os.remove(path)
+            compacted += 1
+        return compacted
+
+
+def segment_paths(directory):
+    """Return the segment files of a log directory, oldest first."""
+    paths = glob.glob(os.path.join(directory, "events-*.log")) + glob.glob(os.path.join(directory, "events-*.col"))
+    return sorted(paths, key=lambda path: (segment_number(path), path.endswith(".log")))
+
+
+def segment_number(path):
+    """Return the sequence number in a segment file name."""
+    return int(os.path.basename(path)[len("events-"):-len(".log")])
+
+
+def read_events(directory, chunk_rows=65536):
+    """
+    Stream every event in a log directory, oldest segment first.
+
+    Only chunk_rows events are held in memory at a time, whatever the log size.
+
+    Args:
+        directory (str): The log directory
+        chunk_rows (int): Events read per chunk
+
+    Yields:
+        tuple: (session id, unix time, kind, scene id, value)
+    """
+    done = set()
+    for path in segment_paths(directory):
+        number = segment_number(path)
+        if number in done:
+            continue  # Both files exist if compaction was interrupted; the columnar one is complete
+        done.add(number)
+        with open(path, "rb") as f:
+            if path.endswith(".log"):
+                while True:
+                    data = f.read(chunk_rows * _EVENT.size)
+                    if len(data) < _EVENT.size:
+                        break
+                    yield from _EVENT.iter_unpack(data[:len(data) - len(data) % _EVENT.size])
+            else:
+                yield from _read_columns(f, chunk_rows)
+
+
+def _read_columns(f, chunk_rows):
+    magic, version, rows = _COLUMNS_HEADER.unpack(f.read(_COLUMNS_HEADER.size))
+    if magic != COLUMNS_MAGIC or version != COLUMNS_VERSION:
+        raise ValueError(f"{f.name}: not an event segment, or written by an incompatible version")
+
+    # Where each column starts
+    starts = []
+    offset = _COLUMNS_HEADER.size
+    for code in _COLUMN_TYPES:
+        starts.append(offset)
+        offset += rows * array(code).itemsize
+
+    for first in range(0, rows, chunk_rows):
+        count = min(chunk_rows, rows - first)
+        columns = []
+        for code, start in zip(_COLUMN_TYPES, starts):
+            column = array(code)
+            f.seek(start + first * column.itemsize)
+            column.frombytes(f.read(count * column.itemsize))
+            columns.append(_little_endian(column))
+        yield from zip(*columns)
+
+
+class SessionEvents(StoryObserver):
+    """Observer that logs one session's scene entries, choices, items and ending to an EventLog."""
+
+    def __init__(self, log, story, session_id=None):
+        """
+        Initialize the observer.
+
+        Args:
+            log (EventLog): Where to write the events
+            story (Story): The compiled story being played, used to number its endings
+            session_id (int, optional): Id to log under; defaults to a new one from the log
+        """
+        self.log = log
+        self.session_id = session_id if session_id is not None else log.new_session()
+        self.ending_ids = {name: i for i, name in enumerate(story.endings)}
+
+    def scene_entered(self, scene_id):
+        self.log.append(self.session_id, SCENE_ENTER, scene_id)
+
+    def choice_made(self, scene_id, choice_index):
+        self.log.append(self.session_id, CHOICE, scene_id, choice_index)
+
+    def items_granted(self, scene_id, items):
+        for item in bit_ids(items):
+            self.log.append(self.session_id, ITEM_GAINED, scene_id, item)
+
+    def story_ended(self, scene_id, ending):
+        self.log.append(self.session_id, ENDING, scene_id, STOPPED if ending is None else self.ending_ids[ending])
+        self.log.flush()  # The session is over, so its events don't wait for a full batch
+
+
+class FunnelStats:
+    """
+    Per-scene funnel and ending totals built from an event stream in one pass.
+
+    Only sessions that have started but not yet ended are held in memory (a
+    bitmask of the scenes each has reached and its last scene), so memory
+    depends on how many sessions overlap, not on the size of the log.
+    """
+
+    def __init__(self, story):
+        """
+        Initialize the totals.
+
+        Args:
+            story (Story): The compiled story the events came from
+        """
+        self.story = story
+        self.ending_names = tuple(story.endings)
+        self.sessions = 0
+        self.reached = Counter()  # Scene id -> sessions that entered it at least once
+        self.dropped = Counter()  # Scene id -> sessions that stopped (or never finished) there
+        self.endings = Counter()  # Ending name -> sessions
+        self.items = Counter()  # Item id -> sessions that gained it
+        self.choices = 0
+        self.open = {}  # Session id -> [scenes reached bitmask, last scene id]
+
+    def add(self, event):
+        """Add one (session id, time, kind, scene id, value) event."""
+        session_id, _, kind, scene_id, value = event
+        state = self.open.get(session_id)
+        if state is None:
+            state = self.open[session_id] = [0, scene_id]
+            self.sessions += 1
+
+        if kind == SCENE_ENTER:
+            if not state[0] >> scene_id & 1:
+                state[0] |= 1 << scene_id
+                self.reached[scene_id] += 1
+            state[1] = scene_id
+        elif kind == CHOICE:
+            self.choices += 1
+        elif kind == ITEM_GAINED:
+            self.items[value] += 1
+        elif kind == ENDING:
+            del self.open[session_id]
+            if value == STOPPED:
+                self.dropped[scene_id] += 1
+                self.endings["stopped"] += 1
+            else:
+                self.endings[self.ending_names[value]] += 1
+
+    def finish(self):
+        """Count sessions that never logged an ending as dropped at their last scene."""
+        for _, last_scene in self.open.values():
+            self.dropped[last_scene] += 1
+            self.endings["unfinished"] += 1
+        self.open.clear()
+        return self
+
+    def rows(self):
+        """
+        Build the funnel table, most-reached scene first.
+
+        Returns:
+            list: (scene name, sessions reached, share of all sessions, sessions dropped there) tuples
+        """
+        total = max(self.sessions, 1)
+        return [(self.story.scene_keys[scene_id], count, count / total, self.dropped[scene_id])
+                for scene_id, count in self.reached.most_common()]
+
+    def report(self):
+        """Summarize the totals as text."""
+        total = max(self.sessions, 1)
+        lines = [f"Sessions: {self.sessions}", "Scene funnel:"]
+        for name, count, share, dropped in self.rows():
+            lines.append(f"  {name:<20} {count:>10}  {share:7.2%}  dropped {dropped}")
+        lines.append("Endings:")
+        for ending, count in self.endings.most_common():
+            lines.append(f"  {ending:<10} {count:>10}  {count / total:7.2%}")
+        lines.append(f"Average path length: {self.choices / total:.2f} choices")
+        lines.append("Item collection rates:")
+        for item, count in self.items.most_common():
+            lines.append(f"  {self.story.item_names[item]:<20} {count / total:7.2%}")
+        return "\n".join(lines)
+
+    def write_csv(self, path):
+        """Write the funnel table as CSV."""
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(["scene", "sessions", "share", "dropped"])
+            writer.writerows(self.rows())
+
+
+def export(directory, story, chunk_rows=65536):
+    """
+    Aggregate a whole event log into funnel and ending statistics.
+
+    Args:
+        directory (str or list): The log directory, or several (e.g. one per story_server worker)
+        story (Story): The compiled story the events came from
+        chunk_rows (int): Events read per chunk
+
+    Returns:
+        FunnelStats: The totals
+    """
+    stats = FunnelStats(story)
+    for path in [directory] if isinstance(directory, str) else directory:
+        for event in read_events(path, chunk_rows):
+            stats.add(event)
+    return stats.finish()
+
+
+# Main program execution
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compact a story event log and report scene funnel statistics.")
+    parser.add_argument("directory", nargs="+", help="event log directory (several are reported together)")
+    parser.add_argument("--compact", action="store_true", help="compact the log first (only while no session is writing to it)")
+    parser.add_argument("--csv", metavar="PATH", help="also write the funnel table as CSV")
+    parser.add_argument("--story", default=DEFAULT_STORY_PATH, help="story file the events came from")
+    args = parser.parse_args()
+
+    if args.compact:
+        print(f"Compacted {sum(EventLog(directory).compact() for directory in args.directory)} segment(s)")
+    funnel = export(args.directory, load_story(args.story))
+    print(funnel.report())
+    if args.csv:
+        funnel.write_csv(args.csv)
@@ -0,0 +1,165 @@
+import argparse
+import time
+from collections import deque, namedtuple
+
+from player_state import bit_ids
+from story_loader import DEFAULT_STORY_PATH, load_story, walk
+
+# Result of exploring a story. States are (scene id, items bitmask) pairs, i.e. a
+# location together with the inventory the player arrives there with.
+#   states            - number of reachable states
+#   transitions       - number of state-to-state moves found
+#   endings           - ending name -> shortest list of (scene name, answer) choices that reaches it
+#   missing_endings   - endings declared in the story that no path reaches
+#   unreachable       - scene names that no path reaches
+#   dead_ends         - reachable states from which no ending can be reached (the player is stuck in a loop)
+Report = namedtuple("Report", "states transitions endings missing_endings unreachable dead_ends")
+
+
+def outcomes(story, scene_id, items):
+    """
+    List every way a scene can end, answering its prompts in every possible way.
+
+    Args:
+        story (Story): The compiled story
+        scene_id (int): Scene to play
+        items (int): Bitmask of items held on arrival
+
+    Returns:
+        list: (answers given, "scene" or "ending", next scene id or ending name, items bitmask) tuples
+    """
+    results = []
+    pending = [((), story.scene(scene_id), items)]
+    while pending:
+        answers, node, items = pending.pop()
+        _, items, node = walk(node, items)
+        if node.fight is not None:
+            # Follow both ways a fight can go
+            pending.append((answers + ("(win fight)",), node.fight.win, items))
+            pending.append((answers + ("(lose fight)",), node.fight.lose, items))
+        elif node.prompt is not None:
+            # Try every answer at this decision point
+            for option, edge in node.edges.items():
+                pending.append((answers + (option,), edge, items))
+        elif node.ending is not None:
+            results.append((answers, "ending", node.ending, items))
+        else:
+            results.append((answers, "scene", node.next, items))
+    return results
+
+
+def explore(story):
+    """
+    Walk the whole (scene, inventory) state graph breadth-first.
+
+    Every state is expanded once, so loops in the story are only followed until
+    they come back to a state that was already seen, and the first path found to
+    each ending is a shortest one (fewest scene-to-scene moves).
+
+    Args:
+        story (Story): The compiled story
+
+    Returns:
+        Report: What was found
+    """
+    start = (story.start, 0)
+    parents = {start: None}  # State -> (previous state, answers that led here); doubles as the seen set
+    incoming = {start: []}  # State -> states that lead to it, for the dead-end search
+    finishing = set()  # States with at least one way to reach an ending
+    endings = {}  # Ending name -> (state it was reached from, answers)
+    transitions = 0
+
+    queue = deque([start])
+    while queue:
+        state = queue.popleft()
+        for answers, kind, target, items in outcomes(story, *state):
+            transitions += 1
+            if kind == "ending":
+                finishing.add(state)
+                if target not in endings:
+                    endings[target] = (state, answers)
+                continue
+
+            following = (target, items)
+            if following not in parents:
+                parents[following] = (state, answers)
+                incoming[following] = []
+                queue.append(following)
+            incoming[following].append(state)
+
+    # Any state that can reach a finishing state can finish; everything else is a dead end
+    can_finish = set(finishing)
+    pending = list(finishing)
+    while pending:
+        for previous in incoming[pending.pop()]:
+            if previous not in can_finish:
+                can_finish.add(previous)
+                pending.append(previous)
+    dead_ends = [state for state in parents if state not in can_finish]
+
+    reached_scenes = {scene for scene, _ in parents}
+    return Report(
+        states=len(parents),
+        transitions=transitions,
+        endings={name: path_to(story, parents, state) + [(story.scene_keys[state[0]], answer) for answer in answers]
+                 for name, (state, answers) in endings.items()},
+        missing_endings=[name for name in story.endings if name not in endings],
+        unreachable=[key for scene, key in enumerate(story.scene_keys) if scene not in reached_scenes],
+        dead_ends=sorted(dead_ends),
+    )
+
+
+def path_to(story, parents, state):
+    """
+    Rebuild the choices that lead from the start to a state.
+
+    Returns:
+        list: (scene name, answer) pairs in the order they are made
+    """
+    path = []
+    while parents[state] is not None:
+        state, answers = parents[state]
+        path.extend((story.scene_keys[state[0]], answer) for answer in reversed(answers))
+    path.reverse()
+    return path
+
+
+def format_report(story, report):
+    """
+    Turn a Report into readable text.
+
+    Args:
+        story (Story): The compiled story the report is about
+        report (Report): The exploration result
+
+    Returns:
+        str: The report text
+    """
+    lines = [f"Reachable states: {report.states} ({report.transitions} transitions)", "", "Shortest path to each ending:"]
+    for name, path in sorted(report.endings.items(), key=lambda ending: len(ending[1])):
+        lines.append(f"  {name} ({len(path)} choices): " + " -> ".join(answer for _, answer in path))
+    for name in report.missing_endings:
+        lines.append(f"  {name}: NOT REACHABLE")
+
+    lines.append("")
+    lines.append("Unreachable scenes: " + (", ".join(report.unreachable) or "none"))
+
+    lines.append(f"Dead-end states: {len(report.dead_ends) or 'none'}")
+    for scene, items in report.dead_ends:
+        held = ", ".join(story.item_names[item] for item in bit_ids(items)) or "no items"
+        lines.append(f"  {story.scene_keys[scene]} holding {held}")
+    return "\n".join(lines)
+
+
+# Main program execution
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Find every reachable state, ending and dead end in a story.")
+    parser.add_argument("story", nargs="?", default=DEFAULT_STORY_PATH, help="story file to analyze")
+    args = parser.parse_args()
+
+    story = load_story(args.story)
+    started = time.perf_counter()
+    report = explore(story)
+    elapsed = time.perf_counter() - started
+    print(format_report(story, report))
+    print(f"\nExplored in {elapsed * 1000:.2f} ms")
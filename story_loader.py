@@ -0,0 +1,448 @@
+import json
+import os
+from collections import namedtuple
+from functools import lru_cache
+from types import MappingProxyType
+
+from combat import compile_combat, fight
+
+# Story file that ships with the game
+DEFAULT_STORY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "forest_story.json")
+
+# One compiled piece of story. A scene is a Node, and so is every branch and choice inside it.
+#   requires - bitmask of items the player must hold for this branch to apply
+#   lacks    - bitmask of items the player must not hold for this branch to apply
+#   record   - name stored in story_choices when this node is picked as a choice
+#   steps    - text lines (str, or TextTemplate if they mention the player), and pauses in seconds (float)
+#   grants   - bitmask of items added to the inventory after the steps are shown
+#   branches - conditional follow-ups; the first one that applies is used
+#   prompt   - question asked at a decision point
+#   options  - the valid answers as Choices, in display order
+#   edges    - maps each answer to the Node it leads to
+#   next     - id of the scene to go to
+#   ending   - name of the ending reached
+#   revisit  - line shown instead of the text the player has already seen when coming back to a scene
+#   fight    - Fight the player has to get through, deciding where the story goes next
+class Node(namedtuple("Node", "requires lacks record steps grants branches prompt options edges next ending revisit "
+                              "fight")):
+    __slots__ = ()
+
+    def applies(self, items):
+        """Return True if a player holding the items bitmask may take this branch."""
+        return items & self.requires == self.requires and not items & self.lacks
+
+
+# A fight at the end of a node: the enemy id, and the Nodes followed when the player wins or loses
+Fight = namedtuple("Fight", "enemy win lose")
+
+
+class TextTemplate(namedtuple("TextTemplate", "text")):
+    """A line of story text with player-specific fields such as {player_name}, filled in when shown."""
+    __slots__ = ()
+
+    def render(self, player_name):
+        return self.text.format(player_name=player_name)
+
+
+class Choices(tuple):
+    """
+    The answers to a prompt, with the "(Choose ...)" text and the index used by
+    resolve() worked out once instead of on every prompt and retry.
+    """
+
+    def __new__(cls, options):
+        choices = super().__new__(cls, options)
+        choices.text = format_options(choices) if choices else ""
+        choices.lookup = match_index(choices)
+        # Whole options and their words, the only keys compared with mistyped answers, with their letters
+        choices.words = tuple((word, option.lower(), frozenset(word)) for option in choices
+                              for word in dict.fromkeys((option.lower(), *option.lower().split())))
+        return choices
+
+    def resolve(self, answer):
+        """
+        Work out which option a player meant.
+
+        Accepts the full option, its number in the list ("1", "2", ...), a prefix
+        of the option or of one of its words ("approach", "fount"), and small
+        typos ("aproach fountain"). Exact answers and shortcuts are a single
+        dictionary lookup; typos are only checked when that lookup fails.
+
+        Args:
+            answer (str): The normalized answer
+
+        Returns:
+            tuple: The lowercase options the answer could mean - one if it is
+                clear, several if it is ambiguous, none if it matches nothing
+        """
+        matches = self.lookup.get(answer)
+        if matches is None:
+            matches = closest_options(self.words, answer)
+        return matches
+
+
+def match_index(options):
+    """
+    Build the answer lookup for a set of options.
+
+    Every prefix of an option and of each word in it is a key (a trie flattened
+    into a dict, so a lookup is one hash instead of a walk down the tree).
+    A prefix shared by several options maps to all of them, which is how
+    ambiguity is reported. Full options and numbers always map to one option.
+
+    Args:
+        options (list): The options, in display order
+
+    Returns:
+        dict: Answer -> tuple of lowercase options it may mean
+    """
+    options = [option.lower() for option in options]
+    candidates = {}
+    for option in options:
+        for word in {option, *option.split()}:
+            for end in range(1, len(word) + 1):
+                found = candidates.setdefault(word[:end], [])
+                if option not in found:
+                    found.append(option)
+
+    lookup = {prefix: tuple(found) for prefix, found in candidates.items()}
+    for number, option in enumerate(options, 1):
+        lookup[str(number)] = (option,)
+    for option in options:
+        lookup[option] = (option,)  # A full option wins over another option it is a prefix of
+    return lookup
+
+
+# Shortest answer that is checked for typos; anything shorter is too easy to mistake for the wrong option
+MIN_FUZZY_LENGTH = 3
+
+
+def closest_options(words, answer):
+    """
+    Find the options closest to a mistyped answer.
+
+    An answer may be off by one edit per four characters (at least one) from
+    an option or one of its words. Only the closest matches are kept, so a tie
+    between options is reported as ambiguous.
+
+    Every letter the answer has and a word lacks (or the other way round) needs
+    at least one edit, so most words are ruled out by comparing letter sets
+    before any distance is computed.
+
+    Args:
+        words (tuple): (option or word of an option, option, its letters) triples, see Choices.words
+        answer (str): The normalized answer
+
+    Returns:
+        tuple: The closest options, or an empty tuple if none is close enough
+    """
+    if len(answer) < MIN_FUZZY_LENGTH:
+        return ()
+    limit = max(1, len(answer) // 4)
+    letters = frozenset(answer)
+    best, matches = limit + 1, []
+    for word, option, word_letters in words:
+        if abs(len(word) - len(answer)) > limit:
+            continue  # Lengths alone already differ by more than the limit
+        if len(letters - word_letters) > limit or len(word_letters - letters) > limit:
+            continue  # Too many letters missing on one side
+        distance = edit_distance(answer, word, limit)
+        if distance > limit:
+            continue
+        if distance < best:
+            best, matches = distance, []
+        if distance == best and option not in matches:
+            matches.append(option)
+    return tuple(matches)
+
+
+def edit_distance(a, b, limit):
+    """
+    Levenshtein distance between two strings, giving up once it exceeds limit.
+
+    Only the cells within limit of the table's diagonal are computed, since any
+    path that strays further already costs more than limit.
+
+    Args:
+        a (str): First string
+        b (str): Second string
+        limit (int): Largest distance of interest
+
+    Returns:
+        int: The distance, or limit + 1 if it is larger than limit
+    """
+    too_far = limit + 1
+    if abs(len(a) - len(b)) > limit:
+        return too_far
+    previous = [j if j <= limit else too_far for j in range(len(b) + 1)]
+    for i, char in enumerate(a, 1):
+        low, high = max(1, i - limit), min(len(b), i + limit)
+        current = [too_far] * (len(b) + 1)
+        current[0] = i if i <= limit else too_far
+        best = current[0]
+        for j in range(low, high + 1):
+            cost = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char != b[j - 1]))
+            current[j] = cost if cost < too_far else too_far
+            if cost < best:
+                best = cost
+        if best > limit:
+            return too_far  # Every path through the table is already too long
+        previous = current
+    return previous[-1]
+
+
+def format_options(options):
+    """
+    Format options as a grammatical list (e.g., "(Choose 'a', 'b', or 'c')").
+
+    Args:
+        options (list): Valid response options
+
+    Returns:
+        str: The text listing the options
+    """
+    option_text = ", ".join([f"'{o}'" for o in options[:-1]])
+    if len(options) > 1:
+        option_text += f", or '{options[-1]}'"
+    else:
+        option_text = f"'{options[0]}'"
+    return f"(Choose {option_text})"
+
+
+NO_CHOICES = Choices(())  # Shared by every node without a prompt
+
+
+class Story:
+    """Compiled, read-only story table shared by every game session."""
+
+    def __init__(self, title, start, scene_keys, scenes, item_names, endings, combat, enemy_names=(), enemies=()):
+        """
+        Initialize the story table.
+
+        Args:
+            title (str): Title shown at the start and end of the game
+            start (int): Id of the first scene
+            scene_keys (tuple): Scene names, indexed by scene id
+            scenes (tuple): Compiled scene Nodes, indexed by scene id
+            item_names (tuple): Item names, indexed by item id
+            endings (dict): Ending name -> (title, text lines)
+            combat (CombatRules): How fights are set up (see combat)
+            enemy_names (tuple): Enemy names, indexed by enemy id
+            enemies (tuple): Enemy Fighters, indexed by enemy id
+        """
+        self.title = title
+        self.start = start
+        self.scene_keys = scene_keys
+        self.scenes = scenes
+        self.item_names = item_names
+        self.endings = MappingProxyType(endings)
+        self.combat = combat
+        self.enemy_names = enemy_names
+        self.enemies = enemies
+
+        # Reverse lookups from names to ids
+        self.scene_ids = MappingProxyType({key: i for i, key in enumerate(scene_keys)})
+        self.item_ids = MappingProxyType({name: i for i, name in enumerate(item_names)})
+        self.enemy_ids = MappingProxyType({name: i for i, name in enumerate(enemy_names)})
+
+    def scene(self, scene_id):
+        """Return the compiled Node for a scene id."""
+        return self.scenes[scene_id]
+
+
+def walk(node, items):
+    """
+    Follow a node into the first branch that applies, collecting text and items on the way.
+
+    Args:
+        node (Node): The node to start from
+        items (int): Bitmask of items the player holds
+
+    Returns:
+        tuple: (steps to show, items bitmask afterwards, node that ends with a prompt, a next scene or an ending)
+    """
+    steps = []
+    while True:
+        steps.extend(node.steps)
+        items |= node.grants  # Add items to inventory
+
+        if not node.branches:
+            return steps, items, node
+
+        # Conditional story branch based on inventory - the last branch always applies
+        node = next(branch for branch in node.branches if branch.applies(items))
+
+
+def settle(story, state, node, steps=None):
+    """
+    Fight every fight a walked node ends in, walking on into each outcome.
+
+    Args:
+        story (Story): The compiled story
+        state (PlayerState): The player (health, items and fight count are updated)
+        node (Node): Node returned by walk()
+        steps (list, optional): Steps to add the fight outcomes and the text after them to
+
+    Returns:
+        Node: The node the story carries on from, which ends with a prompt, a next scene or an ending
+    """
+    while node.fight is not None:
+        won, lines = fight(story, state, node.fight.enemy)
+        more, state.items, node = walk(node.fight.win if won else node.fight.lose, state.items)
+        if steps is not None:
+            steps.extend(lines)
+            steps.extend(more)
+    return node
+
+
+def node_compiler(scene_id, item_mask, check_ending, enemy_id):
+    """
+    Build the function that compiles one node of a story description.
+
+    The resolvers turn the names used in a story file into ids. A story pack
+    (see story_pack) stores ids already, and passes resolvers that keep them.
+
+    Args:
+        scene_id (callable): (scene name, where) -> scene id
+        item_mask (callable): (list of item names, where) -> bitmask of their ids
+        check_ending (callable): (ending name, where) -> None, raising if it is unknown
+        enemy_id (callable): (enemy name, where) -> enemy id
+
+    Returns:
+        callable: compile_node(raw, where, record=None) -> Node
+    """
+    def compile_node(raw, where, record=None):
+        # Numbers become pauses, lines that mention the player become templates, and the rest stay plain strings
+        steps = tuple(float(step) if isinstance(step, (int, float))
+                      else TextTemplate(step) if "{" in step
+                      else step
+                      for step in raw.get("text", ()))
+        revisit = raw.get("revisit")
+        if revisit is not None and "{" in revisit:
+            revisit = TextTemplate(revisit)
+        grants = item_mask(raw.get("grant", ()), where)
+        requires = item_mask(raw.get("requires", ()), where)
+        lacks = item_mask(raw.get("lacks", ()), where)
+
+        # Every node must end in exactly one way
+        exits = [key for key in ("when", "choices", "next", "ending", "fight") if key in raw]
+        if len(exits) != 1:
+            raise ValueError(f"{where}: expected exactly one of 'when', 'choices', 'next', 'ending' or 'fight'")
+
+        branches = ()
+        prompt = None
+        options = NO_CHOICES
+        edges = MappingProxyType({})
+        next_scene = None
+        ending = None
+        encounter = None
+
+        if "when" in raw:
+            branches = tuple(compile_node(branch, f"{where} when[{i}]") for i, branch in enumerate(raw["when"]))
+            # The last branch is the fallback, so the player can never get stuck
+            if branches[-1].requires or branches[-1].lacks:
+                raise ValueError(f"{where}: the last 'when' branch must not have a condition")
+        elif "choices" in raw:
+            prompt = raw.get("prompt", "\nWhat do you do?")
+            options = Choices(option.lower() for option in raw["choices"])
+            edges = MappingProxyType({
+                option.lower(): compile_node(choice, f"{where} choice {option!r}", choice.get("record", option))
+                for option, choice in raw["choices"].items()
+            })
+        elif "next" in raw:
+            next_scene = scene_id(raw["next"], where)
+        elif "ending" in raw:
+            ending = raw["ending"]
+            check_ending(ending, where)
+        else:
+            raw_fight = raw["fight"]
+            encounter = Fight(enemy_id(raw_fight["enemy"], where),
+                              compile_node(raw_fight["win"], f"{where} fight win"),
+                              compile_node(raw_fight["lose"], f"{where} fight lose"))
+
+        return Node(requires, lacks, record, steps, grants, branches, prompt, options, edges, next_scene, ending,
+                    revisit, encounter)
+
+    return compile_node
+
+
+def compile_story(data):
+    """
+    Compile a story description (as loaded from JSON or TOML) into a Story table.
+
+    Args:
+        data (dict): The parsed story file
+
+    Returns:
+        Story: The compiled story
+
+    Raises:
+        ValueError: If the story refers to unknown scenes, items, endings or enemies,
+            a node does not say where the story goes next, or combat stats are out of range
+    """
+    scene_keys = tuple(data["scenes"])
+    scene_ids = {key: i for i, key in enumerate(scene_keys)}
+    item_names = tuple(data.get("items", ()))
+    item_ids = {name: i for i, name in enumerate(item_names)}
+    endings = {name: (ending.get("title", name), tuple(ending.get("text", ())))
+               for name, ending in data.get("endings", {}).items()}
+    combat, enemy_names, enemies = compile_combat(data, item_ids)
+    enemy_ids = {name: i for i, name in enumerate(enemy_names)}
+
+    def lookup(table, name, kind, where):
+        # Turn a name into its id, with a readable error for typos in the story file
+        if name not in table:
+            raise ValueError(f"{where}: unknown {kind} {name!r}")
+        return table[name]
+
+    def item_mask(names, where):
+        # Combine item names into a bitmask of their ids
+        mask = 0
+        for name in names:
+            mask |= 1 << lookup(item_ids, name, "item", where)
+        return mask
+
+    compile_node = node_compiler(
+        lambda name, where: lookup(scene_ids, name, "scene", where),
+        item_mask,
+        lambda name, where: lookup(endings, name, "ending", where),  # Only checking that it exists
+        lambda name, where: lookup(enemy_ids, name, "enemy", where),
+    )
+    scenes = tuple(compile_node(data["scenes"][key], key) for key in scene_keys)
+    start = lookup(scene_ids, data.get("start", scene_keys[0]), "scene", "start")
+    return Story(data.get("title", ""), start, scene_keys, scenes, item_names, endings, combat, enemy_names, enemies)
+
+
+@lru_cache(maxsize=None)
+def load_story(path=DEFAULT_STORY_PATH):
+    """
+    Load and compile a story file. Each file is only compiled once per process.
+
+    Args:
+        path (str): Path to a .json or .toml story file, or a .pack built by story_pack
+
+    Returns:
+        Story: The compiled story
+    """
+    if path.endswith(".pack"):
+        from story_pack import PackedStory  # Scenes are compiled lazily, on first use
+        return PackedStory(path)
+    return compile_story(read_story_file(path))
+
+
+def read_story_file(path):
+    """
+    Parse a story file without compiling it.
+
+    Args:
+        path (str): Path to a .json or .toml story file
+
+    Returns:
+        dict: The story description
+    """
+    if path.endswith(".toml"):
+        import tomllib  # Only needed for TOML stories (Python 3.11+)
+        with open(path, "rb") as f:
+            return tomllib.load(f)
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
@@ -0,0 +1,228 @@
+import os
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from player_state import bit_ids
+
+# Histogram bucket upper bounds in seconds, from sub-millisecond rendering to players thinking for minutes
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+
+def _label(value):
+    # Label values escape backslash, double quote and newline (Prometheus text format)
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class StoryObserver:
+    """
+    Hooks called by InteractiveStory while a session runs.
+
+    Set an observer on a session (session.observer = ...) to receive them. When
+    no observer is set the engine skips the hooks and their timing entirely.
+    Every hook does nothing by default, so observers only override what they need.
+    """
+
+    def scene_entered(self, scene_id):
+        """The player arrived in a scene."""
+
+    def scene_exited(self, scene_id, next_scene, seconds):
+        """The player left a scene for next_scene (None if the story ended) after spending seconds there."""
+
+    def text_rendered(self, scene_id, seconds):
+        """A line of text took seconds to display."""
+
+    def input_waited(self, scene_id, seconds):
+        """The session waited seconds for the player to answer."""
+
+    def invalid_input(self, scene_id):
+        """The player gave an answer that was not one of the options."""
+
+    def items_granted(self, scene_id, items):
+        """The player received new items (a bitmask of item ids)."""
+
+    def choice_made(self, scene_id, choice_index):
+        """The player answered a prompt with the option at choice_index."""
+
+    def story_ended(self, scene_id, ending):
+        """The story finished with an ending (its name), or with None if the player stopped."""
+
+
+class ObserverGroup(StoryObserver):
+    """Passes every hook on to several observers, e.g. shared metrics plus a per-session event log."""
+
+    def __init__(self, *observers):
+        self.observers = observers
+
+    def scene_entered(self, scene_id):
+        for observer in self.observers:
+            observer.scene_entered(scene_id)
+
+    def scene_exited(self, scene_id, next_scene, seconds):
+        for observer in self.observers:
+            observer.scene_exited(scene_id, next_scene, seconds)
+
+    def text_rendered(self, scene_id, seconds):
+        for observer in self.observers:
+            observer.text_rendered(scene_id, seconds)
+
+    def input_waited(self, scene_id, seconds):
+        for observer in self.observers:
+            observer.input_waited(scene_id, seconds)
+
+    def invalid_input(self, scene_id):
+        for observer in self.observers:
+            observer.invalid_input(scene_id)
+
+    def items_granted(self, scene_id, items):
+        for observer in self.observers:
+            observer.items_granted(scene_id, items)
+
+    def choice_made(self, scene_id, choice_index):
+        for observer in self.observers:
+            observer.choice_made(scene_id, choice_index)
+
+    def story_ended(self, scene_id, ending):
+        for observer in self.observers:
+            observer.story_ended(scene_id, ending)
+
+
+class Histogram:
+    """Prometheus-style histogram: counts per bucket plus a running sum."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # The last slot is the +Inf bucket
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class StoryMetrics(StoryObserver):
+    """
+    Collects counters and histograms from any number of sessions and exports them
+    in the Prometheus text format.
+
+    Share one StoryMetrics between all sessions of a process.
+    """
+
+    def __init__(self, story, buckets=DEFAULT_BUCKETS):
+        """
+        Initialize the metrics.
+
+        Args:
+            story (Story): The compiled story, used to label metrics with scene and item names
+            buckets (tuple): Histogram bucket upper bounds in seconds
+        """
+        self.story = story
+        self.entries = defaultdict(int)  # Scene id -> times entered
+        self.invalid = defaultdict(int)  # Scene id -> invalid answers
+        self.transitions = defaultdict(int)  # (from scene id, to scene id or None) -> count
+        self.items = defaultdict(int)  # Item id -> times granted
+        self.dwell = defaultdict(lambda: Histogram(buckets))  # Scene id -> time spent in the scene
+        self.render = defaultdict(lambda: Histogram(buckets))  # Scene id -> time spent showing text
+        self.wait = defaultdict(lambda: Histogram(buckets))  # Scene id -> time spent waiting on the player
+
+    def scene_entered(self, scene_id):
+        self.entries[scene_id] += 1
+
+    def scene_exited(self, scene_id, next_scene, seconds):
+        self.transitions[scene_id, next_scene] += 1
+        self.dwell[scene_id].observe(seconds)
+
+    def text_rendered(self, scene_id, seconds):
+        self.render[scene_id].observe(seconds)
+
+    def input_waited(self, scene_id, seconds):
+        self.wait[scene_id].observe(seconds)
+
+    def invalid_input(self, scene_id):
+        self.invalid[scene_id] += 1
+
+    def items_granted(self, scene_id, items):
+        for item in bit_ids(items):
+            self.items[item] += 1
+
+    def prometheus_text(self):
+        """
+        Render every metric in the Prometheus text exposition format.
+
+        Returns:
+            str: The metrics text
+        """
+        scene = [_label(key) for key in self.story.scene_keys]
+        item_name = [_label(name) for name in self.story.item_names]
+        lines = []
+
+        def counter(name, help_text, values, labels):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} counter")
+            for key, value in sorted(values.items(), key=lambda entry: str(entry[0])):
+                lines.append(f"{name}{{{labels(key)}}} {value}")
+
+        def histogram(name, help_text, values):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} histogram")
+            for scene_id, hist in sorted(values.items()):
+                label = f'scene="{scene[scene_id]}"'
+                total = 0
+                for bound, count in zip(hist.buckets, hist.counts):
+                    total += count
+                    lines.append(f'{name}_bucket{{{label},le="{bound}"}} {total}')
+                lines.append(f'{name}_bucket{{{label},le="+Inf"}} {hist.count}')
+                lines.append(f"{name}_sum{{{label}}} {hist.sum}")
+                lines.append(f"{name}_count{{{label}}} {hist.count}")
+
+        counter("story_scene_entries_total", "Times each scene was entered.",
+                self.entries, lambda scene_id: f'scene="{scene[scene_id]}"')
+        counter("story_transitions_total", "Moves from one scene to the next (to=\"end\" when the story ended).",
+                self.transitions,
+                lambda key: f'from="{scene[key[0]]}",to="{scene[key[1]] if key[1] is not None else "end"}"')
+        counter("story_invalid_inputs_total", "Answers rejected by get_user_input.",
+                self.invalid, lambda scene_id: f'scene="{scene[scene_id]}"')
+        counter("story_items_granted_total", "Items granted to players.",
+                self.items, lambda item: f'item="{item_name[item]}"')
+        histogram("story_scene_dwell_seconds", "Time spent in each scene.", self.dwell)
+        histogram("story_render_seconds", "Time spent displaying each line of text.", self.render)
+        histogram("story_input_wait_seconds", "Time spent waiting for the player to answer.", self.wait)
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        """Write the metrics to a file (e.g. for the node exporter's textfile collector)."""
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            f.write(self.prometheus_text())
+        os.replace(path + ".tmp", path)  # Scrapers never see a half-written file
+
+    def serve(self, port=9108, host="127.0.0.1"):
+        """
+        Serve the metrics over HTTP from a background thread.
+
+        Args:
+            port (int): Port to listen on
+            host (str): Address to listen on
+
+        Returns:
+            ThreadingHTTPServer: The running server (call shutdown() to stop it)
+        """
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = metrics.prometheus_text().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass  # Keep scrapes out of the game's output
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
@@ -0,0 +1,225 @@
+import argparse
+import json
+import mmap
+import os
+import struct
+from collections.abc import Sequence
+from functools import lru_cache
+from types import MappingProxyType
+
+from combat import compile_combat
+from story_loader import DEFAULT_STORY_PATH, Story, compile_story, node_compiler, read_story_file
+
+# Pack layout: a header, a table with one fixed-size entry per scene id, a small JSON
+# block (title, items, endings, combat rules and enemies), then the scenes. Each scene is its
+# UTF-8 name followed by its node as JSON, with scene, item and enemy names already replaced
+# by ids and bitmasks.
+PACK_MAGIC = b"EFPK"
+PACK_VERSION = 2
+_HEADER = struct.Struct("<4sHIIQI")  # Magic, version, scene count, start scene, meta offset, meta length
+_ENTRY = struct.Struct("<QHI")  # Scene offset, name length, node length
+
+# Compiled scenes kept in memory per story; older ones are compiled again from the pack when revisited
+DEFAULT_CACHE_SIZE = 1024
+
+
+def _pack_node(raw, story):
+    # Copy a node with names swapped for what the compiled story uses: scene and enemy ids and item bitmasks
+    node = {}
+    for key, value in raw.items():
+        if key in ("grant", "requires", "lacks"):
+            mask = 0
+            for name in value:
+                mask |= 1 << story.item_ids[name]
+            if mask:
+                node[key] = mask
+        elif key == "next":
+            node[key] = story.scene_ids[value]
+        elif key == "when":
+            node[key] = [_pack_node(branch, story) for branch in value]
+        elif key == "choices":
+            node[key] = {option: _pack_node(choice, story) for option, choice in value.items()}
+        elif key == "fight":
+            node[key] = {"enemy": story.enemy_ids[value["enemy"]],
+                         "win": _pack_node(value["win"], story), "lose": _pack_node(value["lose"], story)}
+        else:
+            node[key] = value  # Text, prompt, record and ending names are stored as they are
+    return node
+
+
+def write_pack(data, path):
+    """
+    Write a story description as a pack that PackedStory can open without compiling it.
+
+    Args:
+        data (dict): The parsed story file
+        path (str): Where to write the pack
+
+    Raises:
+        ValueError: If the story does not compile (nothing is written then)
+    """
+    story = compile_story(data)  # Checks every scene, item and ending reference first
+    meta = json.dumps({
+        "title": story.title,
+        "items": list(story.item_names),
+        "endings": {name: [title, list(text)] for name, (title, text) in story.endings.items()},
+        "combat": data.get("combat", {}),
+        "enemies": data.get("enemies", {}),
+    }).encode("utf-8")
+
+    table = bytearray()
+    blob = bytearray()
+    offset = _HEADER.size + len(story.scene_keys) * _ENTRY.size + len(meta)  # Where the first scene goes
+    for key in story.scene_keys:
+        name = key.encode("utf-8")
+        node = json.dumps(_pack_node(data["scenes"][key], story), separators=(",", ":")).encode("utf-8")
+        table += _ENTRY.pack(offset + len(blob), len(name), len(node))
+        blob += name + node
+
+    header = _HEADER.pack(PACK_MAGIC, PACK_VERSION, len(story.scene_keys), story.start,
+                          _HEADER.size + len(table), len(meta))
+    with open(path + ".tmp", "wb") as f:
+        f.write(header + table + meta + blob)
+    os.replace(path + ".tmp", path)  # Atomic, so a running server never opens half a pack
+
+
+class PackedStory(Story):
+    """
+    Story read lazily from a pack file.
+
+    The pack is memory-mapped, so opening it only reads the header and the title,
+    item, ending and enemy block, whatever the number of scenes. A scene is compiled
+    the first time it is used and kept in a bounded LRU cache. Every process
+    that opens the same pack shares one copy of it in the OS page cache.
+    """
+
+    def __init__(self, path, cache_size=DEFAULT_CACHE_SIZE):
+        """
+        Open a pack.
+
+        Args:
+            path (str): Pack file written by write_pack
+            cache_size (int): Compiled scenes to keep in memory
+
+        Raises:
+            ValueError: If the file is not a pack this version can read
+        """
+        with open(path, "rb") as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)  # Stays valid after the file is closed
+        if len(self.data) < _HEADER.size:
+            raise ValueError("not a story pack: the file is shorter than the pack header")
+        magic, version, count, start, meta_offset, meta_length = _HEADER.unpack_from(self.data)
+        if magic != PACK_MAGIC or version != PACK_VERSION:
+            raise ValueError("not a story pack, or written by an incompatible version")
+        if _HEADER.size + count * _ENTRY.size > len(self.data) or meta_offset + meta_length > len(self.data):
+            raise ValueError("story pack is truncated")  # E.g. a write that was cut short
+        meta = json.loads(self.data[meta_offset:meta_offset + meta_length])
+
+        self.path = path
+        self.title = meta["title"]
+        self.start = start
+        self.count = count
+        self.item_names = tuple(meta["items"])
+        self.item_ids = MappingProxyType({name: i for i, name in enumerate(self.item_names)})
+        self.endings = MappingProxyType({name: (title, tuple(text)) for name, (title, text) in meta["endings"].items()})
+        self.combat, self.enemy_names, self.enemies = compile_combat(meta, self.item_ids)
+        self.enemy_ids = MappingProxyType({name: i for i, name in enumerate(self.enemy_names)})
+        self.scene_keys = PackedSequence(self, self.scene_key)
+        self.scenes = PackedSequence(self, self.scene)
+        self._scene_ids = None
+
+        # The pack already holds ids and bitmasks and was checked when it was written
+        self.compile_node = node_compiler(lambda scene, where: scene, lambda mask, where: mask or 0,
+                                          lambda ending, where: None, lambda enemy, where: enemy)
+        self.cached_scene = lru_cache(maxsize=cache_size)(self.compile_scene)
+
+    @property
+    def scene_ids(self):
+        """Scene name -> id, built on first use (the engine itself only looks scenes up by id)."""
+        if self._scene_ids is None:
+            self._scene_ids = MappingProxyType({key: i for i, key in enumerate(self.scene_keys)})
+        return self._scene_ids
+
+    def entry(self, scene_id):
+        """Return (offset, name length, node length) of a scene in the pack."""
+        if not 0 <= scene_id < self.count:
+            raise IndexError(f"no scene with id {scene_id}")
+        return _ENTRY.unpack_from(self.data, _HEADER.size + scene_id * _ENTRY.size)
+
+    def scene_key(self, scene_id):
+        """Return the name of a scene, read straight from the pack."""
+        offset, name_length, _ = self.entry(scene_id)
+        return self.data[offset:offset + name_length].decode("utf-8")
+
+    def compile_scene(self, scene_id):
+        """Compile a scene from the pack (use scene() to go through the cache)."""
+        offset, name_length, node_length = self.entry(scene_id)
+        start = offset + name_length
+        raw = json.loads(self.data[start:start + node_length])
+        return self.compile_node(raw, self.scene_key(scene_id))
+
+    def scene(self, scene_id):
+        """Return the compiled Node for a scene id, compiling it on first use."""
+        return self.cached_scene(scene_id)
+
+
+def load_cached(story_path, cache_path=None):
+    """
+    Load a story file through a pack cached next to it, so only the first run compiles it.
+
+    The pack is rebuilt whenever the story file is newer than it. If the cache
+    can't be written (e.g. a read-only install), the story is compiled in memory.
+
+    Args:
+        story_path (str): Story file (.json or .toml)
+        cache_path (str, optional): Where to keep the pack; defaults to __pycache__ beside the story
+
+    Returns:
+        Story: The loaded story
+    """
+    if cache_path is None:
+        directory, name = os.path.split(os.path.abspath(story_path))
+        cache_path = os.path.join(directory, "__pycache__", name + ".pack")
+    try:
+        if os.stat(cache_path).st_mtime_ns > os.stat(story_path).st_mtime_ns:
+            return PackedStory(cache_path)
+    except (OSError, ValueError):
+        pass  # No pack yet, or one written by an older version
+
+    data = read_story_file(story_path)
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        write_pack(data, cache_path)
+    except OSError:
+        return compile_story(data)
+    return PackedStory(cache_path)
+
+
+class PackedSequence(Sequence):
+    """Read-only sequence over every scene id of a PackedStory, fetching each item on demand."""
+
+    def __init__(self, story, fetch):
+        self.story = story
+        self.fetch = fetch  # Scene id -> item
+
+    def __len__(self):
+        return self.story.count
+
+    def __getitem__(self, scene_id):
+        if isinstance(scene_id, slice):
+            return [self.fetch(i) for i in range(*scene_id.indices(self.story.count))]
+        if scene_id < 0:
+            scene_id += self.story.count
+        return self.fetch(scene_id)
+
+
+# Main program execution
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compile a story file into a pack that loads lazily.")
+    parser.add_argument("story", nargs="?", default=DEFAULT_STORY_PATH, help="story file (.json or .toml)")
+    parser.add_argument("pack", nargs="?", help="pack to write (default: the story path with .pack)")
+    args = parser.parse_args()
+
+    pack_path = args.pack or os.path.splitext(args.story)[0] + ".pack"
+    write_pack(read_story_file(args.story), pack_path)
+    print(f"Wrote {pack_path} ({os.path.getsize(pack_path)} bytes)")
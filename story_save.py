@@ -0,0 +1,333 @@
+import os
+import struct
+
+from InteractiveStoryProject import InteractiveStory
+from player_state import ChoiceHistory, PlayerState
+from story_loader import load_story, settle, walk
+
+# Checkpoint layout: magic, format version, health, location, journal length, fight seed,
+# fights fought, then three length-prefixed byte strings: items bitmask, visited bitmask
+# and the UTF-8 name. Version 1 checkpoints (without the two fight fields) are still read.
+CHECKPOINT_MAGIC = b"EFSV"
+CHECKPOINT_VERSION = 2
+_HEADER = struct.Struct("<4sHiIQQI")
+_HEADER_V1 = struct.Struct("<4sHiIQ")
+_LENGTH = struct.Struct("<H")
+
+# When to fsync: after every choice, once per batch flush, or never (leave it to the OS)
+FSYNC_POLICIES = ("always", "batch", "never")
+
+
+def _pack_bytes(data):
+    return _LENGTH.pack(len(data)) + data
+
+
+def _unpack_bytes(data, offset):
+    (length,) = _LENGTH.unpack_from(data, offset)
+    offset += _LENGTH.size
+    return data[offset:offset + length], offset + length
+
+
+def pack_state(state, journal_length):
+    """
+    Encode a player state as a compact binary checkpoint.
+
+    Args:
+        state (PlayerState): The state to save
+        journal_length (int): How many journal entries the state already includes
+
+    Returns:
+        bytes: The encoded checkpoint
+    """
+    items = state.items.to_bytes((state.items.bit_length() + 7) // 8, "little")
+    visited = state.visited.to_bytes((state.visited.bit_length() + 7) // 8, "little")
+    return (_HEADER.pack(CHECKPOINT_MAGIC, CHECKPOINT_VERSION, state.health, state.location, journal_length,
+                         state.seed, state.fights)
+            + _pack_bytes(items) + _pack_bytes(visited) + _pack_bytes(state.name.encode("utf-8")))
+
+
+def unpack_state(data):
+    """
+    Decode a checkpoint written by pack_state.
+
+    Args:
+        data (bytes): The encoded checkpoint
+
+    Returns:
+        tuple: (PlayerState, journal length)
+
+    Raises:
+        ValueError: If the data is not a checkpoint this version can read
+    """
+    magic, version = struct.unpack_from("<4sH", data)
+    if magic != CHECKPOINT_MAGIC or version not in (1, CHECKPOINT_VERSION):
+        raise ValueError("not a story checkpoint, or written by an incompatible version")
+    if version == 1:
+        _, _, health, location, journal_length = _HEADER_V1.unpack_from(data)
+        seed, fights, offset = 0, 0, _HEADER_V1.size
+    else:
+        _, _, health, location, journal_length, seed, fights = _HEADER.unpack_from(data)
+        offset = _HEADER.size
+    items, offset = _unpack_bytes(data, offset)
+    visited, offset = _unpack_bytes(data, offset)
+    name, offset = _unpack_bytes(data, offset)
+    state = PlayerState(location, name.decode("utf-8"), health,
+                        int.from_bytes(items, "little"), int.from_bytes(visited, "little"), seed, fights)
+    return state, journal_length
+
+
+class SessionStore:
+    """
+    Persists many game sessions to a directory.
+
+    Each session has a checkpoint file (its latest PlayerState) and an append-only
+    journal holding one byte per choice: the index of the answer in the prompt's
+    options. Journal entries are buffered in memory and written in batches, so
+    thousands of sessions cost a handful of writes rather than one per choice.
+    Call close() (or use the store as a context manager) so the last batch is
+    written before the process exits.
+    """
+
+    def __init__(self, directory, batch_size=4096, fsync="batch"):
+        """
+        Initialize the store.
+
+        Args:
+            directory (str): Where session files are kept (created if missing)
+            batch_size (int): Buffered journal entries (across all sessions) that trigger a flush
+            fsync (str): "always", "batch" or "never" - see FSYNC_POLICIES
+        """
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"fsync must be one of {', '.join(FSYNC_POLICIES)}")
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.batch_size = batch_size if fsync != "always" else 1
+        self.fsync = fsync
+        self.pending = {}  # Session id -> journal bytes not yet written
+        self.pending_count = 0
+        self.lengths = {}  # Session id -> journal length including pending bytes
+
+    def _path(self, session_id, suffix):
+        return os.path.join(self.directory, f"{session_id}.{suffix}")
+
+    def journal_length(self, session_id):
+        """Return how many choices have been journaled for a session (written or pending)."""
+        if session_id not in self.lengths:
+            try:
+                self.lengths[session_id] = os.path.getsize(self._path(session_id, "journal"))
+            except FileNotFoundError:
+                self.lengths[session_id] = 0
+        return self.lengths[session_id]
+
+    def append(self, session_id, choice_index):
+        """
+        Journal one choice.
+
+        Args:
+            session_id (str): Session the choice belongs to
+            choice_index (int): Index of the answer in the prompt's options (0-255)
+        """
+        length = self.journal_length(session_id)
+        self.pending.setdefault(session_id, bytearray()).append(choice_index)
+        self.lengths[session_id] = length + 1
+        self.pending_count += 1
+        if self.pending_count >= self.batch_size:
+            self.flush()
+
+    def flush(self, session_id=None):
+        """
+        Write buffered journal entries to disk.
+
+        Args:
+            session_id (str, optional): Only flush this session; defaults to all of them
+        """
+        sessions = [session_id] if session_id is not None else list(self.pending)
+        for session in sessions:
+            data = self.pending.pop(session, None)
+            if not data:
+                continue
+            self.pending_count -= len(data)
+            with open(self._path(session, "journal"), "ab") as f:
+                f.write(data)
+                if self.fsync != "never":
+                    f.flush()
+                    os.fsync(f.fileno())
+
+    def close(self):
+        """Write every buffered journal entry. The store can still be used afterwards."""
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def checkpoint(self, session_id, state):
+        """
+        Save a session's full state so resuming only needs the journal written after this point.
+
+        Args:
+            session_id (str): Session to checkpoint
+            state (PlayerState): Its current state
+        """
+        self.flush(session_id)  # The journal must reach at least as far as the checkpoint says
+        path = self._path(session_id, "checkpoint")
+        with open(path + ".tmp", "wb") as f:
+            f.write(pack_state(state, self.journal_length(session_id)))
+            if self.fsync != "never":
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(path + ".tmp", path)  # Atomic, so a crash never leaves half a checkpoint
+
+    def load(self, session_id):
+        """
+        Read a session's latest checkpoint and the journal written after it.
+
+        Args:
+            session_id (str): Session to load
+
+        Returns:
+            tuple: (PlayerState, bytes of journal entries after the checkpoint)
+        """
+        self.flush(session_id)
+        with open(self._path(session_id, "checkpoint"), "rb") as f:
+            state, offset = unpack_state(f.read())
+        try:
+            with open(self._path(session_id, "journal"), "rb") as f:
+                f.seek(offset)  # Skip everything the checkpoint already covers
+                tail = f.read()
+        except FileNotFoundError:
+            tail = b""
+        return state, tail
+
+
+class SessionJournal:
+    """Connects one InteractiveStory to a SessionStore, checkpointing every few choices."""
+
+    def __init__(self, store, session_id, checkpoint_every=32):
+        """
+        Initialize the journal.
+
+        Args:
+            store (SessionStore): Where to persist the session
+            session_id (str): Name of the session (used in file names)
+            checkpoint_every (int): Choices between checkpoints
+        """
+        self.store = store
+        self.session_id = session_id
+        self.checkpoint_every = checkpoint_every
+        self.since_checkpoint = None  # None until the first checkpoint is written
+
+    def scene_started(self, state):
+        """Called when the player enters a scene; checkpoints there when one is due."""
+        if self.since_checkpoint is None or self.since_checkpoint >= self.checkpoint_every:
+            self.store.checkpoint(self.session_id, state)
+            self.since_checkpoint = 0
+
+    def choice_made(self, choice_index):
+        """Called with the option index of every answer the player gives."""
+        self.store.append(self.session_id, choice_index)
+        self.since_checkpoint += 1
+
+    def session_ended(self):
+        """Called when the story ends or the player stops; writes the session's buffered choices."""
+        self.store.flush(self.session_id)
+
+
+def replay(story, state, answers):
+    """
+    Apply journaled answers to a checkpointed state without any output.
+
+    After the last answer the story is followed on through any scenes that
+    ask nothing, so a session that reached its ending reports it.
+
+    Args:
+        story (Story): The compiled story the session was played with
+        state (PlayerState): State at the start of a scene (modified in place)
+        answers (bytes): Option indexes, one per prompt, in order
+
+    Returns:
+        tuple: (list of (location, choice) records, id of the scene to continue from
+            or None, name of the ending reached or None)
+    """
+    choices = []
+    scene = state.location
+    node = None  # Set while inside a scene with prompts still to answer
+    arrived = None  # State on entering the current scene
+
+    for index in answers:
+        if node is None:
+            scene, arrived, node, ending = _enter_scenes(story, state, scene)
+            if ending is not None:
+                return choices, None, ending
+        edge = node.edges[node.options[index]]
+        choices.append((story.scene_keys[scene], edge.record))
+        _, state.items, node = walk(edge, state.items)
+        node = settle(story, state, node)  # Fights are rolled from the saved seed, so they end the same way
+
+        if node.prompt is not None:
+            continue  # Another prompt in the same scene
+        if node.ending is not None:
+            return choices, None, node.ending
+        scene = node.next
+        node = None
+
+    if node is None:
+        scene, arrived, node, ending = _enter_scenes(story, state, scene)
+        if ending is not None:
+            return choices, None, ending
+
+    # The journal stops at a prompt: play that scene again from its start
+    state.location, state.items, state.visited = arrived.location, arrived.items, arrived.visited
+    state.health, state.fights = arrived.health, arrived.fights
+    return choices, scene, None
+
+
+def _enter_scenes(story, state, scene):
+    # Enter scenes without any output until one asks something or the story ends. Scenes
+    # that move on without a prompt have no journal entry. Returns (scene id, state on
+    # entering it, its first prompt Node or None, ending name or None).
+    while True:
+        arrived = state.copy()
+        state.enter(scene)
+        _, state.items, node = walk(story.scene(scene), state.items)
+        node = settle(story, state, node)
+        if node.prompt is not None:
+            return scene, arrived, node, None
+        if node.ending is not None:
+            return scene, arrived, None, node.ending
+        scene = node.next
+
+
+def resume_session(store, session_id, story=None, renderer=None, checkpoint_every=32):
+    """
+    Rebuild a saved session from its latest checkpoint plus the journal tail.
+
+    Resuming costs O(journal entries since the checkpoint), not O(whole game).
+    story_choices of the resumed session only holds the replayed tail, and
+    scene descriptions are shown in full again (what was seen is not saved).
+
+    Args:
+        store (SessionStore): Where the session was saved
+        session_id (str): Session to resume
+        story (Story, optional): Compiled story; defaults to the bundled forest story
+        renderer (Renderer, optional): Renderer for the resumed game
+        checkpoint_every (int): Choices between checkpoints from now on
+
+    Returns:
+        tuple: (InteractiveStory ready to continue, scene id to continue from or None if it had ended)
+    """
+    story = story if story is not None else load_story()
+    state, tail = store.load(session_id)
+    choices, scene, ending = replay(story, state, tail)
+
+    session = InteractiveStory(story, renderer)
+    session.state = state
+    session.story_choices = ChoiceHistory(choices)
+    if ending is not None:
+        session.ending = ending
+        session.game_active = False
+    else:
+        session.journal = SessionJournal(store, session_id, checkpoint_every)
+    return session, scene
@@ -0,0 +1,236 @@
+import argparse
+import asyncio
+import gc
+import os
+import signal
+import socket
+import sys
+import time
+import traceback
+
+from async_story import play_connection
+from story_events import EventLog
+from story_loader import DEFAULT_STORY_PATH, load_story
+
+
+class PreforkServer:
+    """
+    Story server that spreads sessions over several worker processes.
+
+    The front process compiles the story, then forks the workers, so each
+    worker inherits the compiled story instead of building its own copy (the
+    pages stay shared until written, and gc.freeze keeps the garbage collector
+    from writing to them). The front process accepts every connection and
+    hands the socket to the next worker in turn over a Unix socket; each worker
+    plays its sessions on its own asyncio event loop, so sessions run on as
+    many cores as there are workers.
+
+    With events_dir set, each worker logs its sessions' events to its own
+    EventLog in a worker-N subdirectory (an EventLog has one writer);
+    story_events.py reports on several directories together.
+
+    Needs os.fork and descriptor passing, so it only runs on Unix.
+    """
+
+    def __init__(self, host="127.0.0.1", port=8023, workers=None, story_path=DEFAULT_STORY_PATH, pace=1.0,
+                 backlog=4096, events_dir=None):
+        """
+        Initialize the server (nothing is started until start()).
+
+        Args:
+            host (str): Address to listen on
+            port (int): Port to listen on (0 picks a free one)
+            workers (int, optional): Worker processes; defaults to the CPU count
+            story_path (str): Story file or pack to serve
+            pace (float): Multiplier for pauses (0 skips them)
+            backlog (int): How many connections may wait to be accepted
+            events_dir (str, optional): Log every session's events under this directory
+        """
+        self.host = host
+        self.port = port
+        self.workers = workers or os.cpu_count() or 1
+        self.story_path = story_path
+        self.pace = pace
+        self.backlog = backlog
+        self.events_dir = events_dir
+        self.listener = None
+        self.channels = []  # Front end of each worker's Unix socket, in worker order
+        self.pids = []
+
+    def start(self):
+        """
+        Compile the story, open the listening socket and fork the workers.
+
+        Returns:
+            int: The port being listened on
+        """
+        story = load_story(self.story_path)
+        self.listener = socket.create_server((self.host, self.port), backlog=self.backlog)
+        self.port = self.listener.getsockname()[1]
+
+        gc.freeze()  # Everything allocated so far is left alone by the collector, so forked pages stay shared
+        for index in range(self.workers):
+            front, back = socket.socketpair(socket.AF_UNIX, socket.SOCK_STREAM)
+            pid = os.fork()
+            if pid == 0:
+                # Worker: keep only its own end of its own channel
+                front.close()
+                self.listener.close()
+                for channel in self.channels:
+                    channel.close()
+                status = 0
+                events = None
+                try:
+                    if self.events_dir is not None:
+                        events = EventLog(os.path.join(self.events_dir, f"worker-{index}"))
+                    asyncio.run(run_worker(back, story, self.pace, events))
+                except KeyboardInterrupt:
+                    pass  # Ctrl-C reaches the whole process group; the front process cleans up
+                except BaseException:
+                    traceback.print_exc()  # The worker is about to vanish; leave a trace of why
+                    sys.stderr.flush()
+                    status = 1
+                finally:
+                    if events is not None:
+                        events.close()  # os._exit skips every other cleanup
+                    os._exit(status)  # Never return into the front process's code
+            back.close()
+            self.channels.append(front)
+            self.pids.append(pid)
+        gc.unfreeze()
+        return self.port
+
+    def serve_forever(self):
+        """
+        Accept connections and hand them to the workers in turn until the listener is closed.
+
+        A worker that has died is dropped and its connection goes to the next
+        one; serving stops once no workers are left.
+        """
+        turn = 0
+        while self.channels:
+            try:
+                connection, _ = self.listener.accept()
+            except OSError:
+                return  # Listener closed by close()
+            with connection:
+                while self.channels:
+                    turn %= len(self.channels)
+                    try:
+                        # The worker gets its own copy of the socket
+                        socket.send_fds(self.channels[turn], [b"s"], [connection.fileno()])
+                    except OSError:
+                        self.drop_worker(turn)
+                        continue  # Try the next worker with the same connection
+                    turn += 1
+                    break
+
+    def drop_worker(self, index):
+        """Forget a worker whose channel has failed, reaping its process if it has exited."""
+        channel = self.channels.pop(index)
+        pid = self.pids.pop(index)
+        channel.close()
+        try:
+            done, status = os.waitpid(pid, os.WNOHANG)
+        except ChildProcessError:
+            done, status = pid, 0
+        if done:
+            print(f"Worker {pid} exited (code {os.waitstatus_to_exitcode(status)}); {len(self.channels)} left",
+                  file=sys.stderr)
+        else:
+            os.kill(pid, signal.SIGTERM)  # Alive but unreachable: stop it
+            os.waitpid(pid, 0)
+            print(f"Worker {pid} stopped responding; {len(self.channels)} left", file=sys.stderr)
+
+    def close(self, timeout=30.0):
+        """
+        Stop accepting, let the workers finish the games in progress, and wait for them to exit.
+
+        Args:
+            timeout (float): Seconds to wait for running games before the remaining workers are stopped
+        """
+        if self.listener is not None:
+            self.listener.close()
+        for channel in self.channels:
+            channel.close()  # Workers stop taking new sessions and exit once their games are over
+        running = set(self.pids)
+        deadline = time.monotonic() + timeout
+        while running:
+            for pid in list(running):
+                try:
+                    done, _ = os.waitpid(pid, os.WNOHANG)
+                except ChildProcessError:
+                    done = pid  # Already reaped
+                if done:
+                    running.discard(pid)
+            if not running or time.monotonic() >= deadline:
+                break
+            time.sleep(0.05)
+        for pid in running:
+            try:
+                os.kill(pid, signal.SIGTERM)  # Still playing after the timeout: stop it
+                os.waitpid(pid, 0)
+            except (ProcessLookupError, ChildProcessError):
+                pass  # Exited in the meantime
+        self.channels = []
+        self.pids = []
+
+
+async def run_worker(channel, story, pace, events=None):
+    """
+    Play every session whose socket arrives on a channel, until the channel closes.
+
+    Args:
+        channel (socket.socket): Worker end of the Unix socket from the front process
+        story (Story): Compiled story shared by all sessions
+        pace (float): Multiplier for pauses (0 skips them)
+        events (EventLog, optional): Log every session's events here
+    """
+    loop = asyncio.get_running_loop()
+    closed = loop.create_future()
+    sessions = set()  # Running session tasks (kept so they aren't garbage collected mid-game)
+    channel.setblocking(False)
+
+    async def play(sock):
+        reader, writer = await asyncio.open_connection(sock=sock, limit=4096)
+        await play_connection(reader, writer, story, pace, events)
+
+    def receive():
+        try:
+            data, fds, _, _ = socket.recv_fds(channel, 64, 64)
+        except BlockingIOError:
+            return
+        for fd in fds:  # Several hand-offs can arrive in one read
+            task = loop.create_task(play(socket.socket(fileno=fd)))
+            sessions.add(task)
+            task.add_done_callback(sessions.discard)
+        if not data and not closed.done():
+            loop.remove_reader(channel)
+            closed.set_result(None)  # Front process went away
+
+    loop.add_reader(channel, receive)
+    await closed
+    if sessions:
+        await asyncio.gather(*sessions, return_exceptions=True)  # Let players already in a game finish
+
+
+# Main program execution
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the story over TCP from several worker processes.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8023)
+    parser.add_argument("--workers", type=int, help="worker processes (default: one per CPU)")
+    parser.add_argument("--story", default=DEFAULT_STORY_PATH, help="story file or pack to serve")
+    parser.add_argument("--pace", type=float, default=1.0, help="multiplier for story pauses (0 disables them)")
+    parser.add_argument("--events", metavar="DIR", help="log every session's events under this directory (one subdirectory per worker)")
+    args = parser.parse_args()
+
+    server = PreforkServer(args.host, args.port, args.workers, args.story, args.pace, events_dir=args.events)
+    port = server.start()
+    print(f"Serving the story on {args.host}:{port} with {server.workers} workers")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
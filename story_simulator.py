@@ -0,0 +1,227 @@
+import argparse
+import json
+import os
+import random
+import time
+from collections import Counter
+from multiprocessing import Pool
+
+from InteractiveStoryProject import InteractiveStory
+from renderers import HeadlessRenderer
+from story_loader import DEFAULT_STORY_PATH, load_story
+
+# Stop a random player after this many choices in case it wanders in circles
+MAX_CHOICES = 500
+
+
+class RandomPlayerStory(InteractiveStory):
+    """InteractiveStory whose answers are picked at random from each prompt's options."""
+
+    def __init__(self, story, rng, max_choices=MAX_CHOICES):
+        """
+        Initialize the story.
+
+        Args:
+            story (Story): Compiled story to play
+            rng (random.Random): Source of the choices, seeded for reproducible runs
+            max_choices (int): Give up (as if the player typed 'stop') after this many choices
+        """
+        # Fights come out the same on every run with the same seed
+        super().__init__(story, HeadlessRenderer(keep_output=False), seed=rng.getrandbits(64))
+        self.rng = rng
+        self.max_choices = max_choices
+
+    def get_user_input(self, prompt, options=None):
+        if not options:
+            return "simulated player"  # The name prompt
+        if len(self.story_choices) >= self.max_choices:
+            self.game_active = False
+            return "stop"
+        return self.rng.choice(options)
+
+
+class SimulationStats:
+    """Totals collected from many playthroughs; partial results from workers are merged."""
+
+    def __init__(self):
+        self.playthroughs = 0
+        self.endings = Counter()  # Ending name (or "stopped") -> playthroughs
+        self.choices = 0  # Total choices made, for the average path length
+        self.items = Counter()  # Item name -> playthroughs that collected it
+        self.fights = 0  # Fights fought in all playthroughs
+        self.fight_health = 0  # Health left after the last fight, summed over playthroughs that fought
+        self.fighters = 0  # Playthroughs with at least one fight
+        self.seconds = 0.0  # Time spent playing, summed over workers
+
+    def add(self, session):
+        """Record one finished InteractiveStory."""
+        self.playthroughs += 1
+        self.endings[session.ending or "stopped"] += 1
+        self.choices += len(session.story_choices)
+        self.items.update(session.inventory)
+        if session.state.fights:
+            self.fights += session.state.fights
+            self.fight_health += session.health
+            self.fighters += 1
+
+    def merge(self, other):
+        """Add another SimulationStats into this one."""
+        self.playthroughs += other.playthroughs
+        self.endings.update(other.endings)
+        self.choices += other.choices
+        self.items.update(other.items)
+        self.fights += other.fights
+        self.fight_health += other.fight_health
+        self.fighters += other.fighters
+        self.seconds += other.seconds
+        return self
+
+    def report(self, wall_seconds, workers):
+        """
+        Summarize the totals as text.
+
+        Args:
+            wall_seconds (float): Elapsed time for the whole run
+            workers (int): Number of worker processes used
+
+        Returns:
+            str: The report
+        """
+        total = max(self.playthroughs, 1)
+        lines = [f"Playthroughs: {self.playthroughs}", "Endings:"]
+        for ending, count in self.endings.most_common():
+            lines.append(f"  {ending:<10} {count:>10}  {count / total:7.2%}")
+        lines.append(f"Average path length: {self.choices / total:.2f} choices")
+        lines.append("Item collection rates:")
+        for item, count in self.items.most_common():
+            lines.append(f"  {item:<20} {count / total:7.2%}")
+        if self.fighters:
+            lines.append(f"Fights: {self.fights} in {self.fighters} playthroughs, "
+                         f"{self.fight_health / self.fighters:.1f} health left on average")
+        per_core = self.playthroughs / self.seconds if self.seconds else 0.0
+        lines.append(f"Throughput: {self.playthroughs / wall_seconds:.0f} playthroughs/s "
+                     f"({per_core:.0f}/s per core, {workers} workers)")
+        return "\n".join(lines)
+
+
+def play_script(story, choices, seed=0):
+    """
+    Replay one recorded playthrough with no delays.
+
+    Answers go through get_user_input exactly as typed answers would, so invalid
+    entries are rejected the same way. Running out of answers stops the story.
+    A fight's outcome decides which prompts the later answers meet, so the
+    fight seed is fixed: the same script and seed always play out the same way.
+
+    Args:
+        story (Story): Compiled story to play
+        choices (list): Answers in order, starting with the player's name
+        seed (int): Seed the player's fights are rolled from
+
+    Returns:
+        InteractiveStory: The finished session
+    """
+    session = InteractiveStory(story, HeadlessRenderer(choices, keep_output=False), seed)
+    session.start_game()
+    return session
+
+
+# Each worker compiles the story once, then reuses it for every job it runs
+_worker_story = None
+
+
+def _init_worker(story_path):
+    global _worker_story
+    _worker_story = load_story(story_path)
+
+
+def _run_random(job):
+    # Fights are resolved one at a time as each playthrough reaches them (combat.fight, the same
+    # resolver and seeds as live play). They are not batched across the chunk: a fight's outcome
+    # decides where its playthrough goes next, so the others can't wait for it. Batched balance
+    # runs over a single fight are what combat.py's command line is for.
+    seed, count = job
+    stats = SimulationStats()
+    started = time.perf_counter()
+    rng = random.Random(seed)
+    for _ in range(count):
+        session = RandomPlayerStory(_worker_story, rng)
+        session.start_game()
+        stats.add(session)
+    stats.seconds = time.perf_counter() - started
+    return stats
+
+
+def _run_scripts(job):
+    first_seed, scripts = job
+    stats = SimulationStats()
+    started = time.perf_counter()
+    for i, choices in enumerate(scripts):
+        stats.add(play_script(_worker_story, choices, first_seed + i))
+    stats.seconds = time.perf_counter() - started
+    return stats
+
+
+def simulate(random_count=0, scripts=(), workers=None, seed=0, chunk_size=2000, story_path=DEFAULT_STORY_PATH):
+    """
+    Run many playthroughs across a process pool and collect the totals.
+
+    Random playthroughs are split into chunks seeded with seed + chunk number,
+    so a run with the same seed and chunk size gives the same results whatever
+    the number of workers. Recorded playthrough n fights with seed + n.
+
+    Args:
+        random_count (int): Number of random playthroughs
+        scripts (list): Recorded playthroughs (lists of answers) to replay
+        workers (int, optional): Worker processes; defaults to the CPU count
+        seed (int): Base seed for random playthroughs and for the fights of recorded ones
+        chunk_size (int): Playthroughs handed to a worker at a time
+        story_path (str): Story file to play
+
+    Returns:
+        tuple: (SimulationStats, wall time in seconds, number of workers)
+    """
+    workers = workers or os.cpu_count() or 1
+    random_jobs = [(seed + i, min(chunk_size, random_count - start))
+                   for i, start in enumerate(range(0, random_count, chunk_size))]
+    script_jobs = [(seed + start, scripts[start:start + chunk_size]) for start in range(0, len(scripts), chunk_size)]
+
+    stats = SimulationStats()
+    started = time.perf_counter()
+    with Pool(workers, initializer=_init_worker, initargs=(story_path,)) as pool:
+        for partial in pool.imap_unordered(_run_random, random_jobs):
+            stats.merge(partial)
+        for partial in pool.imap_unordered(_run_scripts, script_jobs):
+            stats.merge(partial)
+    return stats, time.perf_counter() - started, workers
+
+
+def read_scripts(path):
+    """
+    Read recorded playthroughs: one JSON list of answers per line.
+
+    Args:
+        path (str): File to read
+
+    Returns:
+        list: The playthroughs
+    """
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+# Main program execution
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay or randomly generate many playthroughs and report statistics.")
+    parser.add_argument("--random", type=int, default=0, help="number of random playthroughs")
+    parser.add_argument("--scripts", help="file of recorded playthroughs, one JSON list of answers per line")
+    parser.add_argument("--workers", type=int, help="worker processes (default: one per CPU)")
+    parser.add_argument("--seed", type=int, default=0, help="seed for random playthroughs and for fights")
+    parser.add_argument("--story", default=DEFAULT_STORY_PATH, help="story file to play")
+    args = parser.parse_args()
+
+    scripts = read_scripts(args.scripts) if args.scripts else []
+    if not args.random and not scripts:
+        parser.error("give --random N and/or --scripts FILE")
+    stats, elapsed, workers = simulate(args.random, scripts, args.workers, args.seed, story_path=args.story)
+    print(stats.report(elapsed, workers))